@@ -0,0 +1,105 @@
+import asyncio
+import time
+from src.account.main import Account
+
+DELAY = 0.2
+BALANCE = {"SOL": "12.5", "XETH": "0.0", "ZUSD": "100.0", "ZEUR": "20.0"}
+TRADE_BALANCE = {"eb": "400.0"}
+CLOSED = {
+    "A": {"closetm": 1_700_000_000, "cost": "150.0", "descr": {"pair": "SOLUSD", "type": "buy"}},
+    "B": {"closetm": 1_700_000_500, "cost": "200.0", "descr": {"pair": "SOLUSD", "type": "buy"}},
+    "C": {"closetm": 1_700_000_900, "cost": "90.0", "descr": {"pair": "SOLUSD", "type": "sell"}},
+}
+BOOKS = {
+    "SOLUSD": {"bids": [["20.0", "10.0", 1], ["19.0", "10.0", 1]], "asks": [["20.5", "5.0", 1]]},
+}
+
+
+class FakeClient:
+    # every call takes DELAY seconds, remembers how many calls were in flight at once
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.running = 0
+        self.most = 0
+        self.calls = []
+
+    async def answer(self, name, result):
+        self.calls.append(name)
+        self.running += 1
+        self.most = max(self.most, self.running)
+        try:
+            await asyncio.sleep(DELAY)
+        finally:
+            self.running -= 1
+        if name in self.failing:
+            raise ConnectionError(f"{name} timed out")
+        return {"error": [], "result": result}
+
+    async def private(self, endpoint, data=None):
+        results = {"Balance": dict(BALANCE), "TradeBalance": dict(TRADE_BALANCE), "ClosedOrders": {"closed": {k: dict(v) for k, v in CLOSED.items()}}}
+        return await self.answer(endpoint, results[endpoint])
+
+    async def public(self, endpoint, params=None):
+        assert endpoint == "Depth"
+        pair = params["pair"]
+        if pair not in BOOKS:
+            self.calls.append(f"Depth {pair}")
+            return {"error": ["EQuery:Unknown asset pair"]}
+        return await self.answer(f"Depth {pair}", {pair: BOOKS[pair]})
+
+
+class FakeTransport:
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, coroutine):
+        return asyncio.run(coroutine)
+
+
+def test_concurrent():
+    client = FakeClient()
+    account = Account(transport=FakeTransport(client))
+    start = time.perf_counter()
+    result = account.getBalances()
+    took = time.perf_counter() - start
+    # Balance, TradeBalance and ClosedOrders together, then the book while the other two are still out
+    assert client.most == 3, client.most
+    assert took < 2.5 * DELAY, took
+    sol = result["balances"]["SOL"]
+    # newest buy is the cost basis, 12.5 SOL fill 10 @ 20 and 2.5 @ 19
+    assert sol["cost_basis"] == 200.0
+    assert sol["current_value_to_orderbook"] == 10 * 20.0 + 2.5 * 19.0
+    assert abs(sol["fee"] - sol["current_value_to_orderbook"] * 0.004) < 1e-12
+    assert sol["pnl_minus_fee"] == sol["current_value_to_orderbook"] - 200.0 - sol["fee"]
+    # zero balances are left as they came, cash is not looked up in a book
+    assert result["balances"]["XETH"] == "0.0"
+    assert result["balances"]["ZUSD"]["current_value_to_orderbook"] == 0
+    assert result["balances"]["ZEUR"]["balance"] == 20.0
+    assert [call for call in client.calls if call.startswith("Depth")] == ["Depth SOLUSD"]
+    assert result["usd_trade_balance"] == TRADE_BALANCE
+    assert result["errors"] == {}
+    print(f"getBalances took {took:.2f}s for calls of {DELAY}s")
+
+
+def test_partial():
+    client = FakeClient(failing=("ClosedOrders", "TradeBalance"))
+    result = Account(transport=FakeTransport(client)).getBalances()
+    # the book value is still there, the parts of the failed calls are left out and reported
+    assert result["balances"]["SOL"]["current_value_to_orderbook"] == 247.5
+    assert result["balances"]["SOL"]["cost_basis"] == 0
+    assert result["usd_trade_balance"] is None
+    assert set(result["errors"]) == {"ClosedOrders", "TradeBalance"}
+    assert result["errors"]["ClosedOrders"] == "ClosedOrders timed out"
+
+    result = Account(transport=FakeTransport(FakeClient(failing=("Depth SOLUSD",)))).getBalances()
+    assert result["balances"]["SOL"]["current_value_to_orderbook"] == 0
+    assert result["errors"] == {"Depth SOLUSD": "Depth SOLUSD timed out"}
+
+    result = Account(transport=FakeTransport(FakeClient(failing=("Balance",)))).getBalances()
+    assert result["balances"] == {} and result["usd_trade_balance"] == TRADE_BALANCE
+    assert list(result["errors"]) == ["Balance"]
+    print("getBalances returns what it could get and the errors of the rest")
+
+
+test_concurrent()
+test_partial()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+import time
+import aiohttp
+from aiohttp import web
+from src.account.state import AccountState
+
+BALANCES_SNAPSHOT = {"channel": "balances", "type": "snapshot", "data": [
+    {"asset": "SOL", "asset_class": "currency", "balance": 15.0, "wallets": [
+        {"type": "spot", "id": "main", "balance": 12.5}, {"type": "earn", "id": "flex", "balance": 2.5}]},
+    {"asset": "USD", "asset_class": "currency", "balance": 100.0, "wallets": [{"type": "spot", "id": "main", "balance": 100.0}]},
+    {"asset": "DOT", "asset_class": "currency", "balance": 30.0, "wallets": [{"type": "earn", "id": "bonded", "balance": 30.0}]},
+    {"asset": "ETH", "asset_class": "currency", "balance": 0.5},
+], "sequence": 1}
+EXECUTIONS_SNAPSHOT = {"channel": "executions", "type": "snapshot", "data": [
+    {"order_id": "OA", "symbol": "SOL/USD", "side": "sell", "order_type": "limit", "order_qty": 2.0, "order_status": "new"},
+], "sequence": 1}
+# the open sell fills and the SOL and USD balances move with it
+FILL = [
+    {"channel": "executions", "type": "update", "data": [
+        {"order_id": "OA", "exec_type": "trade", "last_qty": 2.0, "last_price": 20.0, "cum_qty": 2.0, "order_status": "filled"}], "sequence": 2},
+    {"channel": "balances", "type": "update", "data": [
+        {"asset": "SOL", "amount": -2.0, "balance": 10.5, "wallet_type": "spot", "wallet_id": "main", "type": "trade"},
+        {"asset": "USD", "amount": 40.0, "balance": 140.0, "wallet_type": "spot", "wallet_id": "main", "type": "trade"}], "sequence": 2},
+    {"channel": "balances", "type": "update", "data": [
+        {"asset": "SOL", "amount": 1.0, "balance": 3.5, "wallet_type": "earn", "wallet_id": "flex", "type": "earn"}], "sequence": 3},
+    {"channel": "executions", "type": "update", "data": [
+        {"order_id": "OB", "symbol": "ETH/USD", "side": "buy", "order_qty": 0.1, "order_status": "new"}], "sequence": 3},
+]
+
+
+class FakeClient:
+    def __init__(self, rest_balance, delay=0.0):
+        self.rest_balance = rest_balance
+        self.delay = delay
+        self.session = None
+
+    async def start(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def private(self, endpoint, data=None):
+        await asyncio.sleep(self.delay)
+        if endpoint == "GetWebSocketsToken":
+            return {"error": [], "result": {"token": "TOKEN", "expires": 900}}
+        assert endpoint == "Balance"
+        return {"error": [], "result": dict(self.rest_balance)}
+
+
+class FakeTransport:
+    def __init__(self, client):
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+def test_apply():
+    state = AccountState(transport=FakeTransport(FakeClient({})))
+    # nothing loaded yet, the 0.0 of balance() says nothing
+    state.apply(FILL[1])
+    assert not state.known()
+    state.apply(BALANCES_SNAPSHOT)
+    assert state.known()
+    state.apply(EXECUTIONS_SNAPSHOT)
+    # only the spot wallet, REST and websocket names both work, not held is 0
+    assert state.balance("SOL") == 12.5 and state.balance("ZUSD") == 100.0 and state.balance("XXBT") == 0.0
+    # staked only, nothing of it can be traded. Without wallets the total is all there is
+    assert state.balance("DOT") == 0.0 and state.balance("XETH") == 0.5
+    assert [order["order_id"] for order in state.open_orders("SOLUSD")] == ["OA"]
+    for message in FILL:
+        state.apply(message)
+    assert state.balance("SOL") == 10.5 and state.balance("USD") == 140.0
+    assert state.open_orders("SOLUSD") == [] and [order["symbol"] for order in state.open_orders()] == ["ETH/USD"]
+    state.apply({"channel": "heartbeat"})
+    print("AccountState applies balances and executions")
+
+
+def test_reconcile():
+    # REST knows about a BTC deposit the websocket missed and still has SOL from before the fill
+    client = FakeClient({"SOL": "12.5", "SOL.F": "2.5", "XXBT": "0.01", "ZUSD": "140.0"}, delay=0.1)
+    transport = FakeTransport(client)
+    state = AccountState(transport=transport)
+    assert not state.known()
+    transport.run(state.reconcile())
+    assert state.known()
+    assert state.balances == {"SOL": 12.5, "BTC": 0.01, "USD": 140.0}
+
+    async def fill_during_reconcile():
+        reconcile = asyncio.ensure_future(state.reconcile())
+        await asyncio.sleep(0.05)
+        state.apply(FILL[1])
+        await reconcile
+
+    transport.run(fill_during_reconcile())
+    # the fill arrived after REST was asked, its balances are kept, the rest comes from REST
+    assert state.balances == {"SOL": 10.5, "BTC": 0.01, "USD": 140.0}
+    transport.run(state.reconcile())
+    assert state.balance("SOL") == 12.5
+    print("AccountState reconciles against REST without undoing newer websocket updates")
+
+
+def test_websocket():
+    subscriptions = []
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for _ in range(2):
+            subscription = json.loads((await ws.receive()).data)
+            subscriptions.append(subscription)
+            await ws.send_json({"method": "subscribe", "success": True, "result": {"channel": subscription["params"]["channel"]}})
+        await ws.send_json(BALANCES_SNAPSHOT)
+        await ws.send_json(EXECUTIONS_SNAPSHOT)
+        if len(subscriptions) > 2:
+            # the reconnect only gets the snapshot, then stays open until the state stops
+            async for _ in ws:
+                pass
+            return ws
+        await asyncio.sleep(0.2)
+        for message in FILL:
+            await ws.send_json(message)
+        await asyncio.sleep(0.5)
+        # drop the connection, the state connects again and gets a new snapshot
+        await ws.close()
+        return ws
+
+    client = FakeClient({"SOL": "1.0"})
+    transport = FakeTransport(client)
+
+    async def serve():
+        app = web.Application()
+        app.router.add_get("/v2", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner
+
+    runner = transport.run(serve())
+    port = runner.addresses[0][1]
+    state = AccountState(transport=transport, url=f"ws://127.0.0.1:{port}/v2").start()
+    try:
+        assert state.balance("SOL") == 1.0
+        deadline = time.time() + 5
+        while state.balance("SOL") != 12.5 and time.time() < deadline:
+            time.sleep(0.01)
+        assert state.connected and state.balance("SOL") == 12.5
+        while state.balance("SOL") != 10.5 and time.time() < deadline:
+            time.sleep(0.01)
+        assert state.balance("USD") == 140.0 and state.open_orders("SOLUSD") == []
+        start = time.perf_counter()
+        for _ in range(100000):
+            state.balance("SOL")
+        took = (time.perf_counter() - start) / 100000
+        # reconnected after the drop: the snapshot is back
+        while state.balance("SOL") != 12.5 and time.time() < deadline:
+            time.sleep(0.01)
+        assert state.balance("SOL") == 12.5 and len(subscriptions) == 4
+    finally:
+        state.stop()
+        transport.run(client.close())
+        transport.run(runner.cleanup())
+    assert [s["params"]["channel"] for s in subscriptions[:2]] == ["balances", "executions"]
+    assert all(s["params"]["token"] == "TOKEN" and s["params"]["snapshot"] for s in subscriptions)
+    print(f"AccountState follows the websocket, balance() takes {took * 1e9:.0f}ns")
+
+
+test_apply()
+test_reconcile()
+test_websocket()
@@ -1,49 +1,86 @@
 # execute trades through the Kraken API
-import requests
-import json
+import asyncio
 import time
 
-# get kraken signature function
-from src.exchange.kraken.main import get_kraken_signature
+# pooled kraken transport, signs private calls once the rate limiter lets them through
+from src.exchange.kraken.client import get_transport
 # get order book
 from src.execution.orderbook import OrderBook
+# REST Balance names like ZUSD -> USD
+from src.account.state import asset_name
+
+# cash balances, they have no USD order book to value them against
+FIAT = {"USD", "EUR", "GBP", "CAD", "JPY", "AUD", "CHF"}
+
+
+def closed_order_lists(response):
+    """
+    ClosedOrders response -> its result with ['closed'] sorted newest first and split into ['closed_buy'] and ['closed_sell']
+    """
+    # sort by time "closetm"
+    response['result']['closed'] = sorted(response['result']['closed'].items(), key=lambda x: x[1]['closetm'], reverse=True)
+
+    # add human readable time object at position x[1]['closetm']
+    for x in response['result']['closed']:
+        x[1]['nice-time'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(x[1]['closetm']))
+    # split buy and sell orders into separate lists ['descr']['type']
+    response['result']['closed_buy'] = [x for x in response['result']['closed'] if x[1]['descr']['type'] == 'buy']
+    response['result']['closed_sell'] = [x for x in response['result']['closed'] if x[1]['descr']['type'] == 'sell']
+
+    return response['result']
 
 
 # make this a class so getting data and calculating the strategy can be done in one call
 class Account:
-    def __init__(self, exchange="kraken"):
+    def __init__(self, exchange="kraken", transport=None):
         self.exchange = exchange
-        self.headers = get_kraken_signature
-
-    def nonce(self):
-        return str(int(time.time() * 1000))
+        self.transport = transport or get_transport()
 
     # get the balance
     def getBalances(self):
-        url = "https://api.kraken.com/0/private/Balance"
-        uri = "/0/private/Balance"
-        payload = json.dumps({"nonce": self.nonce()})
-
-        balances_response = requests.request(
-            "POST", url, headers=self.headers(uri, payload), data=payload
-        ).json()['result']
-
-        # trade balances
-        trade_balance_url = "https://api.kraken.com/0/private/TradeBalance"
-        trade_balance_uri = "/0/private/TradeBalance"
-        trade_balance_payload = json.dumps({"nonce": self.nonce(), "asset": "ZUSD"})
+        """
+        Balances with cost basis and order book value per held asset, and the USD trade balance.
+        Balance, TradeBalance and ClosedOrders are sent together and the Depth of every held asset as soon as
+        Balance is back, so the refresh takes about as long as its slowest call instead of the sum of all of them.
+        A failed call leaves its part out (trade balance None, cost basis or order book value 0) and is
+        reported under "errors" by call name
+        """
+        return self.transport.run(self.fetch_balances())
 
-        trade_balances_response = requests.request(
-            "POST", trade_balance_url, headers=self.headers(trade_balance_uri, trade_balance_payload), data=trade_balance_payload
-        ).json()['result']
+    async def fetch_balances(self):
+        client = self.transport.client
+        errors = {}
 
+        async def call(name, request):
+            # result of one sub call, None with the error recorded if it failed
+            try:
+                response = await request
+                if response.get("error") and "result" not in response:
+                    raise ValueError(", ".join(response["error"]))
+                return response
+            except Exception as e:
+                errors[name] = str(e)
+                return None
+
+        trade_balances = asyncio.ensure_future(call("TradeBalance", client.private("TradeBalance", {"asset": "ZUSD"})))
+        closed = asyncio.ensure_future(call("ClosedOrders", client.private("ClosedOrders", {"trades": True})))
+        balances = await call("Balance", client.private("Balance"))
+        balances_response = balances["result"] if balances is not None else {}
+
+        # iterate through balances, if the balance is float 0, skip the asset
+        held = [asset for asset in balances_response if float(balances_response[asset]) != 0]
+        # only the assets that are not cash themselves get an order book
+        books = [asset for asset in held if asset_name(asset) not in FIAT]
+        orderbooks = {asset: OrderBook(f"{asset}USD", transport=self.transport) for asset in books}
+        depths = await asyncio.gather(*[call(f"Depth {asset}USD", client.public("Depth", {"pair": f"{asset}USD"})) for asset in books])
+        depths = dict(zip(books, depths))
+        trade_balances = await trade_balances
+        closed = await closed
         # add the latest cost basis for each asset to the response from the getClosedOrders function
-        closed_orders = self.getClosedOrders()
-        # iterate through balances
-        for asset in balances_response:
-             # if the balance is float 0, skip the asset
-            if float(balances_response[asset]) == 0:
-                continue
+        closed_orders = closed_order_lists(closed) if closed is not None else {"closed_buy": []}
+
+        for asset in held:
+            depth = depths.get(asset)
             # replace each asset with a object that has the asset and the cost basis
             balances_response[asset] = {
                 "balance": float(balances_response[asset]),
@@ -57,20 +94,24 @@ class Account:
                     balances_response[asset]['cost_basis'] = float(order[1]['cost'])
                     break
             # get the current value of the asset to the orderbook bids, if the response is empty or the asset is not in the response, the value will be 0
-            orderbook = OrderBook(f"{asset}USD")
             # make sure to have error handling if the asset is not in the response  
-            try:
-                orderbook_data = orderbook.orderBookData()
-                # iterate through bid_quantities and subtract the balance from the bid_quantities to get the current value of the asset to the orderbook bids
-                for i, bid_quantity in enumerate(orderbook_data['bid_quantities']):
-                    if balances_response[asset]['balance'] > bid_quantity:
-                        balances_response[asset]['current_value_to_orderbook'] += bid_quantity * orderbook_data['bid_prices'][i]
-                        balances_response[asset]['balance'] -= bid_quantity
-                    else:
-                        balances_response[asset]['current_value_to_orderbook'] += balances_response[asset]['balance'] * orderbook_data['bid_prices'][i]
-                        break
-            except:
-                balances_response[asset]['current_value_to_orderbook'] = 0
+            # cash has no book, its value stays 0 and it is counted in the trade balance instead
+            if asset in orderbooks:
+                try:
+                    orderbook = orderbooks[asset]
+                    orderbook_data = orderbook.summarize(orderbook.decode(depth))
+                    # iterate through bid_quantities and subtract the balance from the bid_quantities to get the current value of the asset to the orderbook bids
+                    for i, bid_quantity in enumerate(orderbook_data['bid_quantities']):
+                        if balances_response[asset]['balance'] > bid_quantity:
+                            balances_response[asset]['current_value_to_orderbook'] += bid_quantity * orderbook_data['bid_prices'][i]
+                            balances_response[asset]['balance'] -= bid_quantity
+                        else:
+                            balances_response[asset]['current_value_to_orderbook'] += balances_response[asset]['balance'] * orderbook_data['bid_prices'][i]
+                            break
+                except Exception as e:
+                    if depth is not None:
+                        errors[f"Depth {asset}USD"] = str(e)
+                    balances_response[asset]['current_value_to_orderbook'] = 0
             
             # create fee and pnl_minus_fee if the asset is sold
             balances_response[asset]['fee'] = balances_response[asset]['current_value_to_orderbook'] * 0.004
@@ -79,19 +120,17 @@ class Account:
             # after execution usd value
             balances_response[asset]['after_execution_usd_value'] = balances_response[asset]['current_value_to_orderbook'] - balances_response[asset]['fee']
         
-        return {"balances": balances_response, "usd_trade_balance": trade_balances_response}
+        return {
+            "balances": balances_response,
+            "usd_trade_balance": trade_balances["result"] if trade_balances is not None else None,
+            "errors": errors,
+        }
 
     def getAccountTradeVolume(self, pairs=None):
         """'
         pairs: comma separated pairs, e.g. "XXBT/ZUSD, XETH/ZEUR"
         """
-        url = "https://api.kraken.com/0/private/TradeVolume"
-        uri = "/0/private/TradeVolume"
-        payload = json.dumps({"nonce": self.nonce(), "pair": pairs})
-
-        response = requests.request(
-            "POST", url, headers=self.headers(uri, payload), data=payload
-        )
+        response = self.transport.private("TradeVolume", {"pair": pairs})
 
         return response
     
@@ -101,26 +140,8 @@ class Account:
         Orders only placed on Kraken Pro are returned
         list with ['closed'] and ['closed_buy'] and ['closed_sell']
         '''
-        url = "https://api.kraken.com/0/private/ClosedOrders"
-        uri = "/0/private/ClosedOrders"
-        payload = json.dumps({"nonce": self.nonce(), "trades": True,})
-
-        response = requests.request(
-            "POST", url, headers=self.headers(uri, payload), data=payload
-        )
-
-        # sort by time "closetm"
-        response = response.json()
-        response['result']['closed'] = sorted(response['result']['closed'].items(), key=lambda x: x[1]['closetm'], reverse=True)
-        
-        # add human readable time object at position x[1]['closetm']
-        for x in response['result']['closed']:
-            x[1]['nice-time'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(x[1]['closetm']))
-        # split buy and sell orders into separate lists ['descr']['type']
-        response['result']['closed_buy'] = [x for x in response['result']['closed'] if x[1]['descr']['type'] == 'buy']
-        response['result']['closed_sell'] = [x for x in response['result']['closed'] if x[1]['descr']['type'] == 'sell']
-
-        return response['result']
+        response = self.transport.private("ClosedOrders", {"trades": True,})
+        return closed_order_lists(response)
     
 
     def getAccountSummary(self):
@@ -129,14 +150,5 @@ class Account:
         """
         balances = self.getBalances()
 
-        pairs = requests.request(
-            "GET",
-            "https://api.kraken.com/0/public/AssetPairs",
-            headers={"Accept": "application/json"},
-            data={},
-        )
-        pairs = pairs.json()["result"].keys()
-        pairs = ",".join(pairs) 
-        
-        # trade_volume = self.getAccountTradeVolume(pairs).json()
+        # trade_volume = self.getAccountTradeVolume(pairs)
         return {"account": balances}
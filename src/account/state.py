@@ -0,0 +1,219 @@
+# balances and open orders kept in memory from kraken's private websocket, so a strategy poll can check what it
+# holds without asking the REST api every time
+import asyncio
+import json
+import time
+import aiohttp
+from src.exchange.kraken.client import get_transport
+
+WS_AUTH_URL = "wss://ws-auth.kraken.com/v2"
+# seconds between REST Balance calls that correct anything the websocket missed
+RECONCILE = 300
+# kraken sends a heartbeat every second on a subscribed connection, this long without a message it is dead
+SILENCE = 30
+# longest wait before connecting again after the connection dropped
+MAX_BACKOFF = 60
+# order statuses after which an order no longer is open
+CLOSED_STATUSES = {"filled", "canceled", "expired"}
+# REST Balance names of the assets kraken added before its current naming, the websocket uses the new ones
+LEGACY_ASSETS = {
+    "XXBT": "BTC", "XBT": "BTC", "XETH": "ETH", "XETC": "ETC", "XLTC": "LTC", "XXRP": "XRP", "XXLM": "XLM",
+    "XXMR": "XMR", "XZEC": "ZEC", "XREP": "REP", "XMLN": "MLN", "XXDG": "DOGE", "XDG": "DOGE",
+    "ZUSD": "USD", "ZEUR": "EUR", "ZGBP": "GBP", "ZCAD": "CAD", "ZJPY": "JPY", "ZAUD": "AUD",
+}
+
+
+def asset_name(asset):
+    # SOL -> SOL, XXBT -> BTC, ZUSD -> USD
+    return LEGACY_ASSETS.get(asset, asset)
+
+
+class AccountState:
+    """
+    Spot balances per asset and the open orders of the account, applied from the balances and executions channels
+    of kraken's websocket v2 and checked against REST Balance every `reconcile` seconds.
+    balance() and open_orders() only read the in memory maps, they never wait on the network. The maps are only
+    written from the transport's event loop.
+    """
+    def __init__(self, transport=None, reconcile=RECONCILE, url=WS_AUTH_URL):
+        self.transport = transport
+        self.reconcile_every = reconcile
+        self.url = url
+        # asset -> spot balance
+        self.balances = {}
+        # order_id -> latest state of the order
+        self.orders = {}
+        # assets the websocket changed while a REST Balance call was out
+        self.touched = set()
+        self.connected = False
+        self.reconciled = None
+        # a websocket balances snapshot was applied
+        self.snapshot = False
+        self.future = None
+
+    def known(self):
+        # True once the balances came from REST or a websocket snapshot, before that balance() is 0.0 for everything
+        return self.reconciled is not None or self.snapshot
+
+    def balance(self, asset):
+        # e.g. balance("SOL"), the REST names like XXBT / ZUSD work as well. 0.0 for an asset not held, check
+        # known() first, 0.0 also is what it returns before anything was loaded
+        return self.balances.get(asset_name(asset), 0.0)
+
+    def open_orders(self, pair=None):
+        # open orders, for one pair if given ("SOLUSD" or "SOL/USD")
+        orders = list(self.orders.values())
+        if pair is not None:
+            pair = pair.replace("/", "")
+            orders = [order for order in orders if order.get("symbol", "").replace("/", "") == pair]
+        return orders
+
+    def apply(self, message):
+        """
+        Apply one websocket message, anything but balances / executions data is ignored
+        """
+        channel = message.get("channel")
+        if channel == "balances":
+            self.apply_balances(message)
+        elif channel == "executions":
+            self.apply_executions(message)
+
+    def apply_balances(self, message):
+        if message.get("type") == "snapshot":
+            balances = {}
+            for entry in message["data"]:
+                # the snapshot balance is the total over all wallets, only the spot one can be traded. An asset
+                # held only in earn has wallets but no spot one, its spot balance is 0
+                if "wallets" in entry:
+                    balance = sum(float(wallet["balance"]) for wallet in entry["wallets"] if wallet.get("type") == "spot")
+                else:
+                    balance = float(entry["balance"])
+                balances[asset_name(entry["asset"])] = balance
+            self.balances = balances
+            self.touched.update(balances)
+            self.snapshot = True
+            return
+        for entry in message["data"]:
+            if entry.get("wallet_type", "spot") != "spot":
+                continue
+            asset = asset_name(entry["asset"])
+            # every update carries the balance after it, so a missed one is corrected by the next
+            self.balances[asset] = float(entry["balance"])
+            self.touched.add(asset)
+
+    def apply_executions(self, message):
+        if message.get("type") == "snapshot":
+            # the snapshot holds the open orders
+            self.orders = {}
+        for entry in message["data"]:
+            order_id = entry.get("order_id")
+            if order_id is None:
+                continue
+            order = {**self.orders.get(order_id, {}), **entry}
+            if order.get("order_status") in CLOSED_STATUSES:
+                self.orders.pop(order_id, None)
+            else:
+                self.orders[order_id] = order
+
+    def apply_rest(self, result):
+        # replace the balances with a REST Balance result, except the assets the websocket updated meanwhile,
+        # their websocket balance is newer than the REST one. Earn balances (SOL.F, ETH2.S) are left out
+        balances = {}
+        for asset, balance in result.items():
+            if "." in asset:
+                continue
+            balances[asset_name(asset)] = float(balance)
+        for asset in self.touched:
+            if asset in self.balances:
+                balances[asset] = self.balances[asset]
+            else:
+                balances.pop(asset, None)
+        self.balances = balances
+
+    async def reconcile(self):
+        """
+        Correct the balances with REST Balance
+        """
+        self.touched = set()
+        response = await self.transport.client.private("Balance")
+        if response.get("error"):
+            raise ValueError(f"Kraken error for Balance: {response['error']}")
+        self.apply_rest(response["result"])
+        self.reconciled = time.time()
+
+    async def listen(self):
+        """
+        One websocket connection: subscribe to balances and executions and apply every message until it drops
+        """
+        client = self.transport.client
+        response = await client.private("GetWebSocketsToken")
+        if response.get("error"):
+            raise ValueError(f"Kraken error for GetWebSocketsToken: {response['error']}")
+        token = response["result"]["token"]
+        session = await client.start()
+        async with session.ws_connect(self.url, heartbeat=SILENCE) as ws:
+            for channel in ("balances", "executions"):
+                await ws.send_str(json.dumps({"method": "subscribe", "params": {"channel": channel, "token": token, "snapshot": True}}))
+            while True:
+                msg = await ws.receive(timeout=SILENCE)
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise ConnectionError(f"websocket closed: {msg.type.name}")
+                message = json.loads(msg.data)
+                if message.get("method") == "subscribe":
+                    if not message.get("success"):
+                        raise ConnectionError(f"subscribe failed: {message.get('error')}")
+                    self.connected = True
+                    continue
+                self.apply(message)
+
+    async def keep_listening(self):
+        backoff = 1
+        while True:
+            started = time.time()
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Account websocket: {e}")
+            self.connected = False
+            # a connection that lasted a while starts the backoff over
+            backoff = 1 if time.time() - started > MAX_BACKOFF else min(backoff * 2, MAX_BACKOFF)
+            await asyncio.sleep(backoff)
+
+    async def keep_reconciling(self):
+        while True:
+            await asyncio.sleep(self.reconcile_every)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Account reconcile: {e}")
+
+    async def run(self):
+        await asyncio.gather(self.keep_listening(), self.keep_reconciling())
+
+    def start(self):
+        """
+        Load the balances over REST and keep them up to date on the transport's loop from then on, returns self
+        """
+        if self.future is not None and not self.future.done():
+            return self
+        if self.transport is None:
+            self.transport = get_transport()
+        try:
+            self.transport.run(self.reconcile())
+        except Exception as e:
+            # the websocket snapshot fills them in
+            print(f"Account reconcile: {e}")
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), self.transport.loop)
+        return self
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+        self.connected = False
+
+
+# one account state per process, started by the first strategy that needs it
+account_state = AccountState()
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import numpy as np
+from src.data.archive import CandleArchive
+from src.data.candle_buffer import TIME, CLOSE, VOLUME
+from src.strategies.replay import replay_job
+
+START = 1_700_000_000 - 1_700_000_000 % 3600
+
+
+def candles(times, close=100.0):
+    rows = np.zeros((len(times), 8))
+    rows[:, TIME] = times
+    rows[:, 1:6] = close + np.arange(len(times))[:, None]
+    rows[:, VOLUME] = 1
+    rows[:, 7] = 1
+    return rows
+
+
+def test_empty():
+    root = tempfile.mkdtemp()
+    try:
+        archive = CandleArchive.open("NEWUSD", "1", root)
+        assert len(archive) == 0 and archive.last_time() is None
+        assert archive.between().shape == (0, 8)
+        assert archive.between(START, START + 600).shape == (0, 8)
+        # a replay of a pair that was never imported has nothing to trade on
+        result = replay_job({"pair": "NEWUSD", "interval": "1", "size": 1.0, "root": root, "start_time": START})
+        assert result["trades"] == 0 and result["pnl"] == 0.0
+    finally:
+        shutil.rmtree(root)
+    print("an empty archive reads back no candles")
+
+
+def test_append_and_between():
+    root = tempfile.mkdtemp()
+    try:
+        archive = CandleArchive.open("SOLUSD", "1", root)
+        archive.append(candles(START + 60 * np.arange(10)))
+        # slots 3 and 4 missing: flat candles at the previous close with no volume
+        archive.append(candles(START + 60 * np.array([9, 10, 11, 12, 15, 16]), close=200.0))
+        assert len(archive) == 17
+        rows = archive.between()
+        assert np.array_equal(rows[:, TIME], START + 60 * np.arange(17))
+        # the stored candle 9 was still forming, the newer one replaced it
+        assert rows[9, CLOSE] == 200.0
+        assert rows[13, CLOSE] == rows[14, CLOSE] == rows[12, CLOSE] and rows[13, VOLUME] == 0
+        # arithmetic lookup, start inclusive, end exclusive, times inside a slot round up to the next one
+        assert np.array_equal(archive.between(START + 120, START + 300)[:, TIME], START + 60 * np.arange(2, 5))
+        assert np.array_equal(archive.between(START + 130)[:, TIME], START + 60 * np.arange(3, 17))
+        assert len(archive.between(START - 600, START)) == 0
+        assert len(archive.between(START + 6000)) == 0
+        # reopened from the header
+        again = CandleArchive.open("SOLUSD", "1", root)
+        assert again.first == START and np.array_equal(np.array(again.between()), np.array(rows))
+    finally:
+        shutil.rmtree(root)
+    print("archive appends, fills gaps and finds time ranges by arithmetic")
+
+
+if __name__ == "__main__":
+    test_empty()
+    test_append_and_between()
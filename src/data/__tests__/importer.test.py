@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+from src.data.archive import CandleArchive
+from src.data.candle_buffer import TIME, CLOSE, VOLUME
+from src.data.importer import import_dump, import_file
+
+START = 1_700_000_000 - 1_700_000_000 % 3600
+N = 100
+
+
+def ohlcvt(times):
+    close = 100 + np.asarray(times, dtype=float) / 60 - START / 60
+    return np.column_stack([times, close, close + 1, close - 1, close, np.ones(len(times)), np.ones(len(times))])
+
+
+def write_csv(path, rows):
+    np.savetxt(path, rows, delimiter=",", fmt="%.10g")
+
+
+def messy_rows():
+    # 100 one minute candles with slots 40-42 missing, in chunks of 10 rows:
+    # two rows swapped inside a chunk, a duplicate right across a chunk boundary and a row that comes 2 chunks late
+    times = [START + 60 * i for i in range(N) if not 40 <= i <= 42]
+    rows = ohlcvt(times)
+    rows[[4, 5]] = rows[[5, 4]]
+    rows = np.insert(rows, 20, rows[19], axis=0)
+    late = rows[25].copy()
+    rows = np.delete(rows, 25, axis=0)
+    return np.insert(rows, 47, late, axis=0), late
+
+
+def test_chunk_boundaries():
+    root = tempfile.mkdtemp()
+    try:
+        rows, late = messy_rows()
+        os.makedirs(os.path.join(root, "dump"))
+        write_csv(os.path.join(root, "dump", "SOLUSD_1.csv"), rows)
+        archive = CandleArchive(os.path.join(root, "SOLUSD_1.candles"), 1)
+        report = import_file(os.path.join(root, "dump"), "SOLUSD_1.csv", archive, chunk_rows=10)
+        stored = np.array(archive.between())
+        # every slot is there, the gap is filled flat and the late row is reported, not stored
+        assert np.array_equal(stored[:, TIME], START + 60 * np.arange(N))
+        assert np.all(stored[40:43, VOLUME] == 0) and np.all(stored[40:43, CLOSE] == stored[39, CLOSE])
+        real = np.ones(N, dtype=bool)
+        real[40:43] = False
+        real[(int(late[0]) - START) // 60] = False
+        assert np.array_equal(stored[real, CLOSE], ohlcvt(stored[real, TIME])[:, 4])
+        assert report["skipped"] == 1 and report["skipped_ranges"] == [[late[0], late[0]]]
+        assert report["duplicates"] == 1 and report["out_of_order"] == 2
+        assert report["gaps"] == 2 and report["missing_candles"] == 4
+        assert report["min_time"] == START and report["max_time"] == START + 60 * (N - 1)
+    finally:
+        shutil.rmtree(root)
+    print("importer keeps order across chunk boundaries and reports the rows it can't store")
+
+
+def test_zip_dump():
+    root = tempfile.mkdtemp()
+    try:
+        source = os.path.join(root, "dump.zip")
+        times = START + 60 * np.arange(N)
+        with zipfile.ZipFile(source, "w") as dump:
+            for pair in ("SOLUSD", "ETHUSD"):
+                path = os.path.join(root, f"{pair}_1.csv")
+                write_csv(path, ohlcvt(times))
+                dump.write(path, f"Kraken_OHLCVT/{pair}_1.csv")
+        descriptors = len(os.listdir("/proc/self/fd"))
+        for i in range(20):
+            archive = CandleArchive(os.path.join(root, f"SOLUSD_1_{i}.candles"), 1)
+            import_file(source, "Kraken_OHLCVT/SOLUSD_1.csv", archive, chunk_rows=7)
+        # the zip is closed after every file
+        assert len(os.listdir("/proc/self/fd")) <= descriptors + 1
+        manifest = import_dump(source, os.path.join(root, "archive"), workers=2, chunk_rows=7)
+        assert sorted(manifest) == ["ETHUSD_1", "SOLUSD_1"]
+        for report in manifest.values():
+            assert report["candles"] == N and report["min_time"] == START
+            assert report["files"][0]["skipped"] == 0 and report["files"][0]["gaps"] == 0
+        assert os.path.exists(os.path.join(root, "archive", "manifest.json"))
+    finally:
+        shutil.rmtree(root)
+    print("importer loads a zipped dump in worker processes")
+
+
+if __name__ == "__main__":
+    test_chunk_boundaries()
+    test_zip_dump()
@@ -0,0 +1,152 @@
+import time
+from src.data.scheduler import CandleScheduler, DELAY, SPREAD
+from src.exchange.kraken.clock import ServerClock
+
+
+class FakeClient:
+    clock_offset = 0.0
+
+
+class FakeTransport:
+    # kraken's clock runs `ahead` seconds in front of ours and only reports whole seconds
+    def __init__(self, ahead):
+        self.ahead = ahead
+        self.client = FakeClient()
+
+    def public(self, endpoint, params=None):
+        assert endpoint == "Time"
+        return {"result": {"unixtime": int(time.time() + self.ahead)}}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.time = now
+
+    def now(self):
+        return self.time
+
+
+def test_server_clock():
+    transport = FakeTransport(7.3)
+    clock = ServerClock(transport)
+    offset = clock.offset()
+    # three samples a third of a second apart pin it down to about a third of a second
+    assert abs(offset - 7.3) < 0.4, offset
+    assert transport.client.clock_offset == offset
+    assert abs(clock.now() - (time.time() + 7.3)) < 0.4
+    print(f"ServerClock offset {offset:.3f} for 7.3")
+
+
+def test_calls_at_candle_close():
+    start = 1_700_000_040.0
+    clock = FakeClock(start)
+    scheduler = CandleScheduler(clock)
+    calls = []
+    names = [f"wave-PAIR{i}USD-5" for i in range(20)]
+    for name in names:
+        scheduler.register(name, "5", lambda candle_close, closed, name=name: calls.append((clock.time, name, candle_close, closed)))
+    scheduler.register("tape", "1", lambda candle_close, closed: calls.append((clock.time, "tape", candle_close, closed)), ticks=5)
+    # every job is called once right away, for the last candle that closed before it was registered
+    assert scheduler.run_pending() == 21
+    assert {(at, candle_close) for at, name, candle_close, _ in calls if name != "tape"} == {(start, start - start % 300)}
+    assert calls[-1][2] == start - 60 and not calls[-1][3]
+    calls.clear()
+    # step the clock in 10ms steps over 20 minutes
+    while clock.time < start + 1200:
+        clock.time += 0.01
+        scheduler.run_pending()
+    wave = [call for call in calls if call[1] != "tape"]
+    # every pair once per 5 minute close, shortly after it and on its own offset
+    assert len(wave) == 20 * 4
+    for at, name, candle_close, closed in wave:
+        assert closed and candle_close % 300 == 0
+        assert DELAY <= at - candle_close < DELAY + SPREAD + 0.02
+        assert abs(at - candle_close - scheduler.shift(name)) < 0.02
+    assert len({round(scheduler.shift(name), 3) for name in names}) == len(names)
+    # the tape: a call on every minute close and 5 ticks between them
+    tape = [call for call in calls if call[1] == "tape"]
+    assert len(tape) == 20 * 6
+    for at, _, candle_close, closed in tape:
+        assert candle_close % 60 == 0 and 0 <= at - candle_close - scheduler.shift("tape") < 60
+        assert closed == (abs(at - candle_close - scheduler.shift("tape")) < 0.02)
+    print(f"CandleScheduler made {len(calls)} calls on time")
+
+
+def test_skips_missed_calls():
+    clock = FakeClock(1_700_000_000.0)
+    scheduler = CandleScheduler(clock, delay=1, spread=0)
+    calls = []
+
+    def slow(candle_close, closed):
+        calls.append(candle_close)
+        # a call that takes three and a half minutes
+        clock.time += 210
+
+    scheduler.register("slow", "1", slow)
+    # the call on registering belongs to the minute that closed at 1_699_999_980
+    assert scheduler.run_pending() == 1
+    clock.time = 1_700_000_221.0
+    assert scheduler.run_pending() == 1
+    # the closes it overran are dropped, the next call is the first close after it finished
+    clock.time = 1_700_000_461.0
+    assert scheduler.run_pending() == 1
+    assert calls == [1_699_999_980, 1_700_000_220, 1_700_000_460]
+    print("CandleScheduler skips the calls a slow job missed")
+
+
+def test_retries_failed_calls():
+    clock = FakeClock(1_700_000_000.0)
+    scheduler = CandleScheduler(clock, delay=1, spread=0, retry=10, retries=3)
+    calls = []
+    failures = {"flaky": 2, "down": 10 ** 6, "short": 10 ** 6}
+
+    def job(name):
+        def call(candle_close, closed):
+            calls.append((name, clock.time - candle_close, candle_close, closed))
+            if failures[name]:
+                failures[name] -= 1
+                raise ConnectionError("timed out")
+        return call
+
+    scheduler.register("flaky", "240", job("flaky"))
+    scheduler.register("down", "240", job("down"))
+    scheduler.register("short", "1", job("short"))
+    start = clock.time
+    while clock.time < start + 2 * 14400:
+        clock.time += 0.5
+        scheduler.run_pending()
+    # two failures retried 10s apart inside the same candle, then back on the candle closes
+    flaky = [(round(late), close, closed) for name, late, close, closed in calls if name == "flaky"]
+    # the call on registering comes 8000s into the candle that closed at first
+    first = flaky[0][1]
+    assert flaky == [(8000, first, True), (8010, first, True), (8020, first, True), (1, first + 14400, True), (1, first + 28800, True)], flaky
+    # a job that keeps failing gets 3 retries per candle and no more
+    down = {}
+    for name, _, close, _ in calls:
+        if name == "down":
+            down[close] = down.get(close, 0) + 1
+    assert list(down.values()) == [4, 4, 4], down
+    # retries of a 1 minute job stop before its next call
+    short = {}
+    for name, late, close, _ in calls:
+        if name == "short":
+            assert late < 60
+            short[close] = short.get(close, 0) + 1
+    assert set(list(short.values())[:-1]) == {4}
+    # more retries allowed than fit in the minute: the ones that would land after the next close are dropped
+    scheduler = CandleScheduler(clock, delay=1, spread=0, retry=25, retries=5)
+    calls.clear()
+    scheduler.register("short", "1", job("short"))
+    start = clock.time
+    while clock.time < start + 600:
+        clock.time += 0.5
+        scheduler.run_pending()
+    lates = sorted({round(late) for name, late, close, _ in calls if close > start})
+    assert lates == [1, 26, 51], lates
+    print("CandleScheduler retries failed calls inside their candle")
+
+
+test_server_clock()
+test_calls_at_candle_close()
+test_skips_missed_calls()
+test_retries_failed_calls()
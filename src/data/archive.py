@@ -0,0 +1,156 @@
+# append only on disk candle history per pair/interval, read back through a memory map
+# every slot of the interval since the first candle has a fixed width record, so time -> offset is arithmetic
+import os
+import struct
+import numpy as np
+import pandas as pd
+from src.data.candle_buffer import COLUMNS, TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT
+
+ARCHIVE_DIR = os.getenv("CANDLE_ARCHIVE_DIR", "archive")
+MAGIC = b"KRKNOHLC"
+VERSION = 1
+# magic, version, interval seconds, first candle time, padded to 64 bytes
+HEADER = struct.Struct("<8sIIq40x")
+RECORD_WIDTH = len(COLUMNS)
+
+
+def fill_gaps(rows, seconds):
+    """
+    Spread sorted (n, 8) rows over one slot per interval, missing candles become flat candles
+    at the previous close with no volume, like an interval without trades.
+    """
+    slots = ((rows[:, TIME] - rows[0, TIME]) // seconds).astype(np.int64)
+    if slots[-1] == len(rows) - 1:
+        return rows
+    filled = np.empty((slots[-1] + 1, RECORD_WIDTH))
+    present = np.zeros(len(filled), dtype=bool)
+    present[slots] = True
+    filled[slots] = rows
+    # index of the last real candle at or before each slot
+    last = np.maximum.accumulate(np.where(present, np.arange(len(filled)), 0))
+    missing = ~present
+    close = filled[last[missing], CLOSE]
+    filled[missing, TIME] = rows[0, TIME] + np.flatnonzero(missing) * seconds
+    for column in (OPEN, HIGH, LOW, CLOSE, VWAP):
+        filled[missing, column] = close
+    filled[missing, VOLUME] = 0
+    filled[missing, COUNT] = 0
+    return filled
+
+
+class CandleArchive:
+    """
+    One file of fixed width float64 records [time, open, high, low, close, vwap, volume, count], one per interval slot.
+    Reads are zero copy memory maps, writes only ever append (or replace the newest, still forming, candle).
+    """
+    def __init__(self, path, interval=None):
+        self.path = path
+        if os.path.exists(path):
+            with open(path, "rb") as archive:
+                magic, version, seconds, first = HEADER.unpack(archive.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a candle archive")
+            self.seconds = seconds
+            self.first = first
+        else:
+            if interval is None:
+                raise ValueError(f"{path} does not exist, an interval is needed to create it")
+            self.seconds = int(interval) * 60
+            self.first = None
+        self.map = None
+
+    @classmethod
+    def open(cls, pair, interval, root=ARCHIVE_DIR):
+        os.makedirs(root, exist_ok=True)
+        return cls(os.path.join(root, f"{pair}_{interval}.candles"), interval)
+
+    def __len__(self):
+        if self.first is None:
+            return 0
+        return (os.path.getsize(self.path) - HEADER.size) // (RECORD_WIDTH * 8)
+
+    def last_time(self):
+        return self.first + (len(self) - 1) * self.seconds if len(self) else None
+
+    def index(self, time):
+        # slot of the candle that opens at `time`
+        return int((time - self.first) // self.seconds)
+
+    def append(self, rows):
+        """
+        Append sorted (n, 8) candle rows. Rows at or before the newest stored candle are skipped,
+        except the newest one itself which is replaced so a forming candle can be updated.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if not len(rows):
+            return
+        if self.first is None:
+            self.first = int(rows[0, TIME])
+            with open(self.path, "wb") as archive:
+                archive.write(HEADER.pack(MAGIC, VERSION, self.seconds, self.first))
+            rows = fill_gaps(rows, self.seconds)
+        else:
+            last = self.last_time()
+            rows = rows[rows[:, TIME] >= last]
+            if not len(rows):
+                return
+            if rows[0, TIME] == last:
+                # the newest stored candle may still have been forming, rewrite it in place
+                with open(self.path, "r+b") as archive:
+                    archive.seek(-RECORD_WIDTH * 8, os.SEEK_END)
+                    archive.write(rows[0].tobytes())
+                tail = rows[:1]
+            else:
+                tail = np.array(self.read(len(self) - 1, len(self)))
+            # bridge any gap between the stored candles and the new ones
+            rows = fill_gaps(np.vstack([tail, rows[rows[:, TIME] > last]]), self.seconds)[1:]
+        with open(self.path, "ab") as archive:
+            archive.write(np.ascontiguousarray(rows).tobytes())
+
+    def read(self, start=0, end=None):
+        """
+        (n, 8) memory mapped view of slots [start, end), nothing is copied or parsed
+        """
+        size = len(self)
+        if not size:
+            return np.empty((0, RECORD_WIDTH))
+        # remap once the file has grown
+        if self.map is None or len(self.map) != size:
+            self.map = np.memmap(self.path, dtype=np.float64, mode="r", offset=HEADER.size, shape=(size, RECORD_WIDTH))
+        return self.map[start:end]
+
+    def between(self, start_time=None, end_time=None):
+        """
+        Candles with start_time <= time < end_time, found by arithmetic on the interval
+        """
+        if self.first is None:
+            # nothing imported yet
+            return self.read()
+        start = 0 if start_time is None else max(0, -(-(start_time - self.first) // self.seconds))
+        end = len(self) if end_time is None else max(0, -(-(end_time - self.first) // self.seconds))
+        return self.read(int(start), int(end))
+
+    def to_frame(self, start_time=None, end_time=None):
+        # copy a time range into a DataFrame for the notebooks
+        return pd.DataFrame(np.array(self.between(start_time, end_time)), columns=COLUMNS)
+
+
+def ohlcvt_rows(ohlcvt):
+    """
+    (n, 7) Kraken OHLCVT values (time, open, high, low, close, volume, trades) -> (n, 8) archive rows.
+    Those dumps carry no vwap so it is stored as NaN.
+    """
+    rows = np.full((len(ohlcvt), RECORD_WIDTH), np.nan)
+    rows[:, [TIME, OPEN, HIGH, LOW, CLOSE, VOLUME, COUNT]] = ohlcvt[:, :7]
+    return rows
+
+
+def import_ohlcvt(csv_path, archive):
+    """
+    Bulk load a Kraken OHLCVT csv (no header) into an archive, see src/data/importer.py for whole dumps
+    """
+    ohlcvt = pd.read_csv(csv_path, header=None, dtype=np.float64, engine="c").to_numpy()
+    rows = ohlcvt_rows(ohlcvt)
+    rows = rows[np.argsort(rows[:, TIME], kind="stable")]
+    archive.append(rows)
+    return archive
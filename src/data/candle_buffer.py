@@ -0,0 +1,110 @@
+# fixed size columnar ring buffer for OHLC candles so the live loops never rebuild a DataFrame per poll
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count']
+TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT = range(len(COLUMNS))
+
+
+class CandleBuffer:
+    """
+    Preallocated float64 buffer of the last `capacity` candles, oldest first.
+    Each column is stored twice back to back (slot i and i + capacity) so the live window
+    is always one contiguous slice and column views can go to numpy/pywt/scipy without a copy.
+    Views are live, they change when the buffer is written to, copy them if you need a snapshot.
+    """
+    def __init__(self, capacity=720):
+        self.capacity = capacity
+        self.data = np.zeros((len(COLUMNS), 2 * capacity))
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def write(self, slot, row):
+        self.data[:, slot] = row
+        self.data[:, slot + self.capacity] = row
+
+    def append(self, row):
+        """
+        Add a candle row [time, open, high, low, close, vwap, volume, count] at the end, evicting the oldest when full
+        """
+        if self.size == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+        self.write((self.start + self.size) % self.capacity, row)
+        self.size += 1
+
+    def extend(self, rows):
+        """
+        Add a (n, 8) array of candle rows at the end in one write, evicting the oldest when full
+        """
+        rows = rows[-self.capacity:]
+        slots = (self.start + self.size + np.arange(len(rows))) % self.capacity
+        self.data[:, slots] = rows.T
+        self.data[:, slots + self.capacity] = rows.T
+        size = self.size + len(rows)
+        if size > self.capacity:
+            self.start = (self.start + size - self.capacity) % self.capacity
+            size = self.capacity
+        self.size = size
+
+    def replace_last(self, row):
+        # overwrite the newest candle, used for the still forming candle
+        self.write((self.start + self.size - 1) % self.capacity, row)
+
+    def pop(self):
+        # drop the newest candle
+        self.size -= 1
+
+    def drop_from(self, time):
+        # drop every candle at or after `time` so they can be replaced by fresher data
+        while self.size and self.data[TIME, self.start + self.size - 1] >= time:
+            self.pop()
+
+    def row(self, i):
+        # view of the i-th candle of the window, oldest first
+        return self.data[:, self.start + i]
+
+    def column(self, index):
+        return self.data[index, self.start:self.start + self.size]
+
+    @property
+    def time(self):
+        return self.column(TIME)
+
+    @property
+    def open(self):
+        return self.column(OPEN)
+
+    @property
+    def high(self):
+        return self.column(HIGH)
+
+    @property
+    def low(self):
+        return self.column(LOW)
+
+    @property
+    def close(self):
+        return self.column(CLOSE)
+
+    @property
+    def vwap(self):
+        return self.column(VWAP)
+
+    @property
+    def volume(self):
+        return self.column(VOLUME)
+
+    @property
+    def count(self):
+        return self.column(COUNT)
+
+    def last_time(self):
+        return self.data[TIME, self.start + self.size - 1] if self.size else None
+
+    def to_frame(self):
+        # copy the window into a DataFrame, only for plotting and research code
+        return pd.DataFrame({name: self.column(i).copy() for i, name in enumerate(COLUMNS)})
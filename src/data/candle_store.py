@@ -0,0 +1,76 @@
+# keep one local copy of the Kraken OHLC candles per (pair, interval) and only ask the api for what's new
+import threading
+from src.data.candle_buffer import CandleBuffer, TIME
+from src.exchange.kraken.decode import result_rows, decode_ohlc
+from src.exchange.kraken.client import get_transport
+
+# kraken never returns more than the last 720 candles of an interval
+MAX_CANDLES = 720
+
+
+class CandleStore:
+    def __init__(self, max_candles=MAX_CANDLES, transport=None):
+        self.max_candles = max_candles
+        # pooled kraken transport, resolved on the first download so importing the store doesn't start it
+        self.transport = transport
+        # (pair, interval) -> CandleBuffer of the last max_candles candles, oldest first
+        self.buffers = {}
+        # (pair, interval) -> the 'last' cursor kraken handed back on the previous poll
+        self.cursors = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def key(self, pair, interval):
+        return (pair, str(interval))
+
+    def key_lock(self, key):
+        with self.lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            return self.locks[key]
+
+    def get_ohlc_data(self, pair, interval, since=None):
+        querystring = {"pair": pair, "interval": interval}
+        if since is not None:
+            querystring["since"] = since
+        if self.transport is None:
+            self.transport = get_transport()
+        data = self.transport.public("OHLC", querystring)
+        return decode_ohlc(result_rows(data, pair)), data["result"]["last"]
+
+    def merge(self, key, rows):
+        """
+        Merge freshly polled (n, 8) candle rows into the stored candles.
+        The first polled row is the candle that was still forming last time (or newer),
+        so everything from its time onwards is replaced.
+        """
+        buffer = self.buffers[key]
+        if len(rows):
+            buffer.drop_from(rows[0, TIME])
+            buffer.extend(rows)
+
+    def refresh(self, pair, interval):
+        """
+        Download the full window on the first call for (pair, interval), afterwards only the candles since the last cursor
+        """
+        key = self.key(pair, interval)
+        with self.key_lock(key):
+            if key not in self.buffers:
+                rows, last = self.get_ohlc_data(pair, interval)
+                self.buffers[key] = CandleBuffer(self.max_candles)
+            else:
+                rows, last = self.get_ohlc_data(pair, interval, since=self.cursors[key])
+            self.merge(key, rows)
+            self.cursors[key] = last
+            return self.buffers[key]
+
+    def candles(self, pair, interval):
+        """
+        Get the up to date CandleBuffer for a pair and interval, oldest candle first.
+        The buffer is shared and updated in place on the next refresh.
+        """
+        return self.refresh(pair, interval)
+
+
+# shared by every strategy in the process so each (pair, interval) is only downloaded once
+candle_store = CandleStore()
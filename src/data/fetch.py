@@ -0,0 +1,78 @@
+# download OHLC for many pairs and intervals at once and assemble them into one long table
+# every call runs concurrently on the pooled kraken client, the rows are decoded into numpy and copied exactly once
+import numpy as np
+import pandas as pd
+from src.data.candle_buffer import COLUMNS
+from src.exchange.kraken.client import get_transport
+from src.exchange.kraken.decode import result_rows, decode_ohlc
+
+
+async def fetch_many(client, keys, since=None):
+    """
+    Send one OHLC call per (pair, interval) concurrently, the rate limiter still paces them
+    returns the raw responses (or the exception a call raised) in the order of keys
+    """
+    calls = []
+    for pair, interval in keys:
+        params = {"pair": pair, "interval": interval}
+        if since is not None:
+            params["since"] = since
+        calls.append(client.public("OHLC", params))
+    return await client.gather(*calls, return_exceptions=True)
+
+
+def fetch_ohlc(pairs, intervals=(1,), since=None, transport=None):
+    """
+    Get the candles of every pair for every interval
+    returns ({(pair, interval): (n, 8) array}, {(pair, interval): error}) so one bad pair doesn't lose the rest
+    """
+    transport = transport or get_transport()
+    keys = [(pair, str(interval)) for pair in pairs for interval in intervals]
+    responses = transport.run(fetch_many(transport.client, keys, since))
+    candles = {}
+    errors = {}
+    for (pair, interval), response in zip(keys, responses):
+        try:
+            if isinstance(response, BaseException):
+                raise response
+            candles[(pair, interval)] = decode_ohlc(result_rows(response, pair))
+        except Exception as e:
+            errors[(pair, interval)] = e
+    return candles, errors
+
+
+def ohlc_table(candles):
+    """
+    {(pair, interval): (n, 8) array} -> one long DataFrame with pair and interval columns.
+    The output is preallocated from the row counts and every block is copied into its slice,
+    instead of growing a frame with pd.concat per pair.
+    """
+    keys = list(candles)
+    sizes = np.array([len(candles[key]) for key in keys], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    values = np.empty((offsets[-1], len(COLUMNS)))
+    for i, key in enumerate(keys):
+        values[offsets[i]:offsets[i + 1]] = candles[key]
+    table = pd.DataFrame(values, columns=COLUMNS, copy=False)
+    # pair/interval repeat for every row, store them as categories instead of one string per row
+    position = np.repeat(np.arange(len(keys)), sizes)
+    pairs = pd.unique(pd.Series([pair for pair, _ in keys], dtype=object))
+    intervals = pd.unique(pd.Series([interval for _, interval in keys], dtype=object))
+    pair_codes = pd.Index(pairs).get_indexer([pair for pair, _ in keys])
+    interval_codes = pd.Index(intervals).get_indexer([interval for _, interval in keys])
+    table.insert(0, "pair", pd.Categorical.from_codes(pair_codes[position], categories=pairs))
+    table.insert(1, "interval", pd.Categorical.from_codes(interval_codes[position], categories=intervals))
+    table["time"] = pd.to_datetime(table["time"], unit="s")
+    table["count"] = table["count"].astype(np.int64)
+    return table
+
+
+def fetch_ohlc_table(pairs, intervals=(1,), since=None, transport=None):
+    """
+    One long format DataFrame [pair, interval, time, open, high, low, close, vwap, volume, count] for a whole universe,
+    pairs that failed are printed and left out
+    """
+    candles, errors = fetch_ohlc(pairs, intervals, since, transport)
+    for (pair, interval), error in errors.items():
+        print(f"Could not fetch {pair} {interval}: {error}")
+    return ohlc_table(candles)
@@ -0,0 +1,169 @@
+# stream a whole Kraken OHLCVT dump (zip or directory of PAIR_INTERVAL.csv files) into candle archives
+# files are read in chunks and every pair/interval is converted in its own worker process
+import contextlib
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.data.archive import ARCHIVE_DIR, CandleArchive, ohlcvt_rows
+
+CHUNK_ROWS = 1_000_000
+# only the first gaps of a file are listed in the report, the counts are always complete
+MAX_REPORTED_GAPS = 20
+
+
+def parse_name(name):
+    # "Kraken_OHLCVT/SOLUSD_60.csv" -> ("SOLUSD", 60)
+    pair, interval = os.path.basename(name)[:-len(".csv")].rsplit("_", 1)
+    return pair, int(interval)
+
+
+def dump_files(source):
+    """
+    csv names in a dump, zip member names or paths relative to the directory
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as dump:
+            names = dump.namelist()
+    else:
+        names = [
+            os.path.relpath(os.path.join(folder, file), source)
+            for folder, _, files in os.walk(source)
+            for file in files
+        ]
+    return sorted(name for name in names if name.endswith(".csv") and "_" in os.path.basename(name))
+
+
+@contextlib.contextmanager
+def open_csv(source, name):
+    # the zip is closed with the member so a worker doesn't keep a handle per file open
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as dump, dump.open(name) as handle:
+            yield handle
+    else:
+        with open(os.path.join(source, name), "rb") as handle:
+            yield handle
+
+
+def import_file(source, name, archive, chunk_rows=CHUNK_ROWS):
+    """
+    Stream one csv into an archive chunk by chunk, validating timestamps as it goes
+    """
+    seconds = archive.seconds
+    previous = archive.last_time()
+    report = {
+        "file": name,
+        "rows": 0,
+        "min_time": None,
+        "max_time": None,
+        # rows whose time went backwards, they are sorted back in within their chunk
+        "out_of_order": 0,
+        "duplicates": 0,
+        # rows older than what the archive already held (or an earlier chunk of the file wrote), the archive only
+        # appends so they can't be stored, their time ranges are listed and a warning is printed
+        "skipped": 0,
+        "skipped_ranges": [],
+        "gaps": 0,
+        "missing_candles": 0,
+        "gap_ranges": [],
+    }
+    with open_csv(source, name) as handle:
+        for chunk in pd.read_csv(handle, header=None, dtype=np.float64, chunksize=chunk_rows, engine="c"):
+            ohlcvt = chunk.to_numpy()
+            times = ohlcvt[:, 0]
+            steps = np.diff(times if previous is None else np.insert(times, 0, previous))
+            report["out_of_order"] += int((steps < 0).sum())
+            if (steps <= 0).any():
+                ohlcvt = ohlcvt[np.argsort(times, kind="stable")]
+                # keep the last row of a repeated time
+                keep = np.append(ohlcvt[1:, 0] != ohlcvt[:-1, 0], True)
+                report["duplicates"] += int((~keep).sum())
+                ohlcvt = ohlcvt[keep]
+            if previous is not None:
+                # a row at the newest archived time replaces it, like a repeated time inside a chunk
+                report["duplicates"] += int((ohlcvt[:, 0] == previous).sum())
+                older = ohlcvt[:, 0] < previous
+                if older.any():
+                    late = ohlcvt[older, 0]
+                    report["skipped"] += len(late)
+                    if len(report["skipped_ranges"]) < MAX_REPORTED_GAPS:
+                        report["skipped_ranges"].append([float(late[0]), float(late[-1])])
+                ohlcvt = ohlcvt[~older]
+            if not len(ohlcvt):
+                continue
+            times = ohlcvt[:, 0]
+            bounds = times if previous is None else np.insert(times, 0, previous)
+            gap_steps = np.diff(bounds)
+            gaps = np.flatnonzero(gap_steps > seconds)
+            report["gaps"] += len(gaps)
+            report["missing_candles"] += int((gap_steps[gaps] // seconds - 1).sum())
+            for gap in gaps[:MAX_REPORTED_GAPS - len(report["gap_ranges"])]:
+                report["gap_ranges"].append([float(bounds[gap]), float(bounds[gap + 1])])
+            archive.append(ohlcvt_rows(ohlcvt))
+            report["rows"] += len(ohlcvt)
+            report["min_time"] = float(times[0]) if report["min_time"] is None else min(report["min_time"], float(times[0]))
+            report["max_time"] = float(times[-1]) if report["max_time"] is None else max(report["max_time"], float(times[-1]))
+            previous = times[-1]
+    if report["skipped"]:
+        print(f"{name}: skipped {report['skipped']} rows older than what was already archived, see skipped_ranges")
+    return report
+
+
+def import_pair(source, names, root=ARCHIVE_DIR, chunk_rows=CHUNK_ROWS, overwrite=False):
+    """
+    Import every file of one pair/interval (a dump may hold several, e.g. quarterly updates) in order
+    """
+    pair, interval = parse_name(names[0])
+    path = os.path.join(root, f"{pair}_{interval}.candles")
+    if overwrite and os.path.exists(path):
+        os.remove(path)
+    archive = CandleArchive(path, interval)
+    files = [import_file(source, name, archive, chunk_rows) for name in names]
+    return {
+        "pair": pair,
+        "interval": interval,
+        "archive": path,
+        "candles": len(archive),
+        "min_time": archive.first,
+        "max_time": archive.last_time(),
+        "files": files,
+    }
+
+
+def import_dump(source, root=ARCHIVE_DIR, workers=None, chunk_rows=CHUNK_ROWS, overwrite=False):
+    """
+    Import a whole OHLCVT dump with a process pool and write root/manifest.json with the
+    min/max time, candle count and validation report of every archive
+    """
+    os.makedirs(root, exist_ok=True)
+    groups = {}
+    for name in dump_files(source):
+        groups.setdefault(parse_name(name), []).append(name)
+
+    manifest_path = os.path.join(root, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as saved:
+            manifest = json.load(saved)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(import_pair, source, names, root, chunk_rows, overwrite) for names in groups.values()]
+        for done, job in enumerate(as_completed(jobs), 1):
+            report = job.result()
+            manifest[f"{report['pair']}_{report['interval']}"] = report
+            problems = sum(file["out_of_order"] + file["duplicates"] for file in report["files"])
+            gaps = sum(file["gaps"] for file in report["files"])
+            skipped = sum(file["skipped"] for file in report["files"])
+            print(f"[{done}/{len(jobs)}] {report['pair']} {report['interval']}m: {report['candles']} candles, {gaps} gaps, {problems} out of order/duplicate rows, {skipped} skipped")
+
+    with open(manifest_path, "w") as saved:
+        json.dump(manifest, saved, indent=2)
+    return manifest
+
+
+# python -m src.data.importer Kraken_OHLCVT.zip [archive dir]
+if __name__ == "__main__":
+    import_dump(sys.argv[1], *sys.argv[2:3])
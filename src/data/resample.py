@@ -0,0 +1,147 @@
+# build higher interval candles locally from one maintained 1 minute feed instead of downloading every interval
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.data.candle_buffer import CandleBuffer, TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT
+from src.data.candle_store import candle_store
+
+
+def bucket_start(time, interval):
+    # kraken aligns candles to multiples of the interval since the unix epoch, so daily candles open at 00:00 UTC
+    seconds = int(interval) * 60
+    return time - time % seconds
+
+
+def combine(candle, minute, bucket):
+    """
+    Fold a 1 minute candle into the candle of the bucket it belongs to, candle is None for the first minute of a bucket
+    """
+    if candle is None:
+        candle = minute.copy()
+        candle[TIME] = bucket
+        return candle
+    volume = candle[VOLUME] + minute[VOLUME]
+    return np.array([
+        bucket,
+        candle[OPEN],
+        max(candle[HIGH], minute[HIGH]),
+        min(candle[LOW], minute[LOW]),
+        minute[CLOSE],
+        (candle[VWAP] * candle[VOLUME] + minute[VWAP] * minute[VOLUME]) / volume if volume else candle[VWAP],
+        volume,
+        candle[COUNT] + minute[COUNT],
+    ])
+
+
+def without(candle, rows):
+    """
+    Candle minus the volume, count and vwap of the (n, 8) minute rows it already contains, the open, high and low
+    stay as they are
+    """
+    volume = candle[VOLUME] - rows[:, VOLUME].sum()
+    traded = candle[VWAP] * candle[VOLUME] - (rows[:, VWAP] * rows[:, VOLUME]).sum()
+    candle = candle.copy()
+    # rounding can leave a hair of volume when the rows are all of it
+    if volume <= 1e-9 * candle[VOLUME]:
+        volume = 0.0
+    candle[VOLUME] = volume
+    candle[COUNT] = max(candle[COUNT] - rows[:, COUNT].sum(), 0)
+    if volume:
+        candle[VWAP] = traded / volume
+    return candle
+
+
+class CandleResampler:
+    """
+    Candles for several intervals of one pair, all kept up to date from the 1 minute feed.
+    Each higher interval is downloaded once to seed its history, after that every closed
+    minute is folded into the forming candle of each interval and the still forming minute is shown on top of it.
+    """
+    def __init__(self, pair, intervals, store=candle_store, capacity=720):
+        self.pair = pair
+        self.intervals = [str(interval) for interval in intervals if str(interval) != "1"]
+        self.store = store
+        self.capacity = capacity
+        self.buffers = {}
+        # interval -> candle of the closed minutes folded into the forming bucket so far
+        self.partial = {}
+        # interval -> open time of the forming bucket
+        self.buckets = {}
+        # time of the last closed minute folded in
+        self.last_minute = None
+        self.minutes = None
+
+    def seed(self):
+        self.minutes = self.store.candles(self.pair, "1")
+        # every minute but the last one is closed
+        closed = self.minutes.time[:-1]
+        last_minute = closed[-1] if len(closed) else self.minutes.time[0] - 60
+        # the seed downloads are independent, send them together instead of waiting on each in turn
+        with ThreadPoolExecutor(max_workers=max(1, len(self.intervals))) as pool:
+            seeds = list(pool.map(lambda interval: self.store.get_ohlc_data(self.pair, interval), self.intervals))
+        for interval, (rows, _) in zip(self.intervals, seeds):
+            buffer = CandleBuffer(self.capacity)
+            buffer.extend(rows)
+            self.buffers[interval] = buffer
+            bucket = bucket_start(last_minute, interval)
+            self.buckets[interval] = bucket
+            partial = None
+            if self.minutes.time[0] <= bucket:
+                # the whole bucket is covered by the minute feed so rebuild it exactly from the closed minutes
+                for i in np.flatnonzero(closed >= bucket):
+                    partial = combine(partial, self.minutes.row(i), bucket)
+            elif len(rows) and bucket in rows[:, TIME]:
+                # bucket opened before the minute window (e.g. 1440 after 12:00 UTC): kraken's candle without the
+                # minutes the window holds, the forming one included, is what happened before the window. The closed
+                # ones are folded back in exactly, the forming one is put on top by the next refresh. Only trades
+                # between the two downloads can still be off
+                inside = np.flatnonzero(bucket_start(self.minutes.time, interval) == bucket)
+                partial = without(rows[rows[:, TIME] == bucket][-1], self.minutes.data[:, self.minutes.start + inside].T)
+                for i in inside[inside < len(closed)]:
+                    partial = combine(partial, self.minutes.row(i), bucket)
+            # the forming candle gets rebuilt by the next refresh
+            buffer.drop_from(bucket)
+            if partial is not None:
+                buffer.append(partial)
+            self.partial[interval] = partial
+        # only mark as seeded once every interval is in, so a failed download is retried on the next refresh
+        self.last_minute = last_minute
+
+    def fold(self, minute, closed):
+        for interval in self.intervals:
+            bucket = bucket_start(minute[TIME], interval)
+            if bucket != self.buckets[interval]:
+                # first minute of a new bucket, the previous candle already holds all of its closed minutes
+                self.buckets[interval] = bucket
+                self.partial[interval] = None
+            candle = combine(self.partial[interval], minute, bucket)
+            if closed:
+                self.partial[interval] = candle
+            buffer = self.buffers[interval]
+            if buffer.last_time() == bucket:
+                buffer.replace_last(candle)
+            else:
+                buffer.append(candle)
+
+    def refresh(self):
+        """
+        Poll the 1 minute feed once and bring every interval up to date
+        """
+        if self.last_minute is None:
+            self.seed()
+        self.minutes = self.store.candles(self.pair, "1")
+        times = self.minutes.time
+        # fold the minutes that closed since the last refresh, then the forming one on top
+        first = np.searchsorted(times, self.last_minute, side="right")
+        for i in range(first, len(times) - 1):
+            self.fold(self.minutes.row(i), closed=True)
+            self.last_minute = times[i]
+        if len(times):
+            self.fold(self.minutes.row(len(times) - 1), closed=False)
+
+    def candles(self, interval):
+        """
+        CandleBuffer for an interval as of the last refresh, the 1 minute buffer is the candle store's own
+        """
+        if str(interval) == "1":
+            return self.minutes
+        return self.buffers[str(interval)]
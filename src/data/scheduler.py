@@ -0,0 +1,113 @@
+# call strategies when their candle closes on kraken's clock instead of sleeping a fixed time between polls
+import heapq
+import math
+import time
+import zlib
+from src.exchange.kraken.clock import ServerClock
+
+# seconds after the close before the first call, kraken needs a moment to publish the closed candle
+DELAY = 1.0
+# the calls of different jobs are spread over this many seconds after DELAY
+SPREAD = 4.0
+# a call that raised is made again this many seconds later, at most RETRIES times and only inside its candle
+RETRY = 10.0
+RETRIES = 3
+
+
+class CandleScheduler:
+    """
+    Calls each registered job right after every close of its interval's candle, on kraken's clock, and
+    optionally `ticks` more times evenly spaced inside the candle for jobs that watch the forming candle.
+    Every job is shifted by its own offset in [delay, delay + spread), taken from a hash of its name so it is
+    the same in every process, so many pairs don't all hit the api at the top of the minute.
+    A job is called as job(candle_close, closed): candle_close is the server time of the candle boundary the
+    call belongs to, closed is True for the call right after the close. Calls a slow job missed are skipped.
+    A job is also called once right when it is registered, with the last call time it would have had, so a
+    240 or 1440 minute job doesn't sit idle until its next close.
+    A call that raised (e.g. a network error) is made again `retry` seconds later with the same arguments, up to
+    `retries` times as long as that is before the job's next call.
+    """
+    def __init__(self, clock=None, delay=DELAY, spread=SPREAD, retry=RETRY, retries=RETRIES):
+        self.clock = clock or ServerClock()
+        self.delay = delay
+        self.spread = spread
+        self.retry = retry
+        self.retries = retries
+        # (server time of the next call, order registered, job entry)
+        self.queue = []
+        self.count = 0
+
+    def shift(self, name):
+        return self.delay + zlib.crc32(name.encode()) / 2 ** 32 * self.spread
+
+    def next_call(self, entry, now):
+        # first call time after now: calls are every period seconds from the epoch, moved by the job's shift
+        period = entry["seconds"] / (entry["ticks"] + 1)
+        step = math.floor((now - entry["shift"]) / period) + 1
+        return step * period + entry["shift"], step
+
+    def register(self, name, interval, job, ticks=0, now=None):
+        """
+        Call job now and after every close of `interval` minute candles, plus `ticks` calls inside each candle.
+        Ticks are only worth it further apart than the client's FORMING seconds, OHLC polls in between are
+        answered from its cache
+        """
+        entry = {"name": name, "seconds": int(interval) * 60, "job": job, "ticks": ticks, "shift": self.shift(name), "failed": 0}
+        now = self.clock.now() if now is None else now
+        # the first call is due right away and belongs to the latest call time that already passed
+        _, step = self.next_call(entry, now)
+        entry["step"] = step - 1
+        heapq.heappush(self.queue, (now, self.count, entry))
+        self.count += 1
+        return entry
+
+    def push(self, entry, now):
+        at, step = self.next_call(entry, now)
+        entry["step"] = step
+        heapq.heappush(self.queue, (at, self.count, entry))
+        self.count += 1
+
+    def push_retry(self, entry, now):
+        # the same call again in a few seconds if it is still before the next one, False if it is given up
+        at = now + self.retry
+        if entry["failed"] > self.retries or at >= self.next_call(entry, now)[0]:
+            return False
+        heapq.heappush(self.queue, (at, self.count, entry))
+        self.count += 1
+        return True
+
+    def run_pending(self, now=None):
+        """
+        Call every job that is due at server time now, returns how many were called
+        """
+        now = self.clock.now() if now is None else now
+        called = 0
+        while self.queue and self.queue[0][0] <= now:
+            _, _, entry = heapq.heappop(self.queue)
+            ticks = entry["ticks"] + 1
+            # the candle boundary this call belongs to, the call right on it is the close
+            candle_close = entry["step"] // ticks * entry["seconds"]
+            try:
+                entry["job"](candle_close, entry["step"] % ticks == 0)
+                entry["failed"] = 0
+            except Exception as e:
+                entry["failed"] += 1
+                print(f"Error in {entry['name']}: {e}")
+            called += 1
+            # from the time after the call, so a call that overran doesn't queue up the ones it missed
+            if entry["failed"] and self.push_retry(entry, max(now, self.clock.now())):
+                continue
+            entry["failed"] = 0
+            self.push(entry, max(now, self.clock.now()))
+        return called
+
+    def run(self):
+        """
+        Run the jobs forever, sleeping until the next one is due
+        """
+        while True:
+            if self.queue:
+                time.sleep(max(0.0, self.queue[0][0] - self.clock.now()))
+            else:
+                time.sleep(1)
+            self.run_pending()
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from src.exchange.kraken.nonce import NonceCounter
+
+def draw(key, count):
+    counter = NonceCounter(key=key)
+    drawn = [[] for _ in range(4)]
+
+    def take(nonces):
+        for _ in range(count):
+            nonces.append(counter.next())
+    threads = [threading.Thread(target=take, args=(nonces,)) for nonces in drawn]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return drawn
+
+
+# 4 threads in each of 3 processes drawing from the same key never get the same nonce, each sees them go up
+def test_unique_across_threads_and_processes():
+    # a key of its own so the test doesn't share the counter file with a running bot
+    key = f"test-{uuid.uuid4()}"
+    with multiprocessing.get_context("spawn").Pool(3) as pool:
+        results = pool.starmap(draw, [(key, 2000)] * 3)
+    nonces = [nonce for drawn in results for thread in drawn for nonce in thread]
+    assert len(nonces) == len(set(nonces)) == 3 * 4 * 2000
+    for drawn in results:
+        for thread in drawn:
+            assert all(a < b for a, b in zip(thread, thread[1:]))
+    # a later counter for the key carries on after all of them
+    assert NonceCounter(key=key).next() > max(nonces)
+    os.remove(NonceCounter(key=key).path)
+    print(f"{len(nonces)} nonces from 3 processes x 4 threads, all unique and increasing")
+
+
+def test_unshared():
+    counter = NonceCounter(shared=False)
+    nonces = [counter.next() for _ in range(5000)]
+    assert all(a < b for a, b in zip(nonces, nonces[1:]))
+    print("unshared nonces increase")
+
+
+if __name__ == "__main__":
+    test_unique_across_threads_and_processes()
+    test_unshared()
@@ -0,0 +1,132 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+import json
+from src.exchange.kraken.rate_limit import RateLimiter, CallCounter, ORDER, ACCOUNT
+
+# a small fast counter so the test takes about a second
+LIMIT, DECAY = 5, 20.0
+
+
+def calls(key, host, count):
+    # count public calls paced by a limiter of its own, returns when each was let through
+    limiter = RateLimiter(key=key, host=host)
+    limiter.public.limit, limiter.public.decay = LIMIT, DECAY
+
+    async def run():
+        sent = []
+        for _ in range(count):
+            await limiter.schedule("/0/public/OHLC")
+            sent.append(time.time())
+        return sent
+    return asyncio.run(run()), limiter.public.path, limiter.private.path
+
+
+# 3 processes with different api keys on the same host share one public counter, so together they stay under it
+def test_public_shared_per_host():
+    host = f"test-{uuid.uuid4()}"
+    with multiprocessing.get_context("spawn").Pool(3) as pool:
+        results = pool.starmap(calls, [(f"key-{i}", host, 10) for i in range(3)])
+    sent = sorted(at for times, _, _ in results for at in times)
+    assert len({path for _, path, _ in results}) == 1
+    assert len({path for _, _, path in results}) == 3
+    # no stretch of time let more through than the burst plus what decayed in it (with some slack for the clock)
+    for i in range(len(sent)):
+        for j in range(i, len(sent)):
+            assert j - i + 1 <= LIMIT + (sent[j] - sent[i]) * DECAY + 1, (i, j)
+    took = sent[-1] - sent[0]
+    assert took >= (30 - LIMIT - 1) / DECAY, took
+    os.remove(results[0][1])
+    for _, _, path in results:
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"30 public calls from 3 keys on one host paced over {took:.2f}s")
+
+
+def private_calls(key, start, count, uri, priority, results):
+    # from start on, count concurrent private calls at priority, puts (uri, requested, [let through]) on results
+    limiter = RateLimiter(key=key)
+    limiter.private.limit, limiter.private.decay = LIMIT, 10.0
+
+    async def call(sent):
+        await limiter.schedule(uri, priority=priority)
+        sent.append(time.time())
+
+    async def run():
+        await asyncio.sleep(start - time.time())
+        sent = []
+        await asyncio.gather(*[call(sent) for _ in range(count)])
+        return sent
+    requested = max(start, time.time())
+    results.put((uri, requested, asyncio.run(run())))
+
+
+# an order check in one process goes ahead of the account polls another process has queued for longer,
+# although the polls cost 1 and fit first while it needs 2
+def test_order_beats_poll_across_processes():
+    key = f"key-{uuid.uuid4()}"
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start = time.time() + 2
+    processes = [
+        context.Process(target=private_calls, args=(key, start, 20, "/0/private/Balance", ACCOUNT, results)),
+        context.Process(target=private_calls, args=(key, start + 0.5, 1, "/0/private/QueryOrders", ORDER, results)),
+    ]
+    for process in processes:
+        process.start()
+    done = dict((uri, (requested, sent)) for uri, requested, sent in [results.get(timeout=30) for _ in processes])
+    for process in processes:
+        process.join()
+    requested, (order,) = done["/0/private/QueryOrders"]
+    polls = done["/0/private/Balance"][1]
+    # the order waited for 2 to decay, not for the polls to finish
+    assert order - requested < 0.5, order - requested
+    assert len([at for at in polls if requested < at < order]) <= 2
+    assert max(polls) > order + 0.5
+    path = RateLimiter(key=key).private.path
+    with open(path) as state:
+        assert json.load(state)["waiting"] == {}
+    os.remove(path)
+    print(f"an order check went ahead of another process's polls after {order - requested:.2f}s")
+
+
+# an order waiting for its pair's trading counter doesn't take from or hold up the private counter
+def test_waits_on_both_counters():
+    limiter = RateLimiter(shared=False)
+    private = CallCounter(3, 1.0)
+    trading = CallCounter(2, 4.0)
+    trading.reserve(2)
+    done = []
+
+    async def order():
+        await limiter.acquire([(private, 1), (trading, 1)], ORDER)
+        done.append(("order", time.time()))
+
+    async def account():
+        await limiter.acquire([(private, 1)], ACCOUNT)
+        done.append(("account", time.time()))
+
+    async def run():
+        start = time.time()
+        task = asyncio.ensure_future(order())
+        await asyncio.sleep(0.01)
+        # the order is first in priority but its pair is full: the account calls go ahead of it
+        await asyncio.gather(account(), account())
+        assert [name for name, _ in done] == ["account", "account"]
+        assert time.time() - start < 0.1
+        assert abs(private.level - 2) < 0.1
+        await task
+        # once the trading counter decayed the order took from both
+        assert done[-1][0] == "order" and 0.2 < done[-1][1] - start < 0.5
+        assert abs(private.level - 3) < 0.5 and trading.level > 1
+
+    asyncio.run(run())
+    print("an order waiting on its pair leaves the private counter to the others")
+
+
+if __name__ == "__main__":
+    test_public_shared_per_host()
+    test_waits_on_both_counters()
+    test_order_beats_poll_across_processes()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from src.exchange.kraken import client as kraken_client, single_flight
+from src.exchange.kraken.client import KrakenClient
+from src.exchange.kraken.single_flight import SingleFlight
+
+KEY = ["OHLC", [["interval", "1"], ["pair", "SOLUSD"]]]
+
+
+def test_since_shares_one_entry():
+    directory = tempfile.mkdtemp()
+    cache = SingleFlight(directory=directory)
+    sent = []
+
+    def call(since):
+        async def send():
+            sent.append(since)
+            await asyncio.sleep(0.01)
+            return {"error": [], "result": {"since": since}}
+        return send
+
+    async def run():
+        expires = time.time() + 60
+        # every poll with a later cursor is answered by the response fetched from the earliest one
+        assert (await cache.do(KEY, call(100), expires=expires, since=100))["result"]["since"] == 100
+        for since in (160, 220, 280):
+            assert (await cache.do(KEY, call(since), expires=expires, since=since))["result"]["since"] == 100
+        # an earlier cursor than the cached one is fetched, and its result replaces the narrower one
+        assert (await cache.do(KEY, call(40), expires=expires, since=40))["result"]["since"] == 40
+        assert (await cache.do(KEY, call(None), expires=expires))["result"]["since"] is None
+        assert (await cache.do(KEY, call(100), expires=expires, since=100))["result"]["since"] is None
+        # another process reads the shared file
+        assert (await SingleFlight(directory=directory).do(KEY, call(500), expires=expires, since=500))["result"]["since"] is None
+        # identical in flight requests share one call
+        fresh = ["OHLC", [["interval", "5"], ["pair", "SOLUSD"]]]
+        await asyncio.gather(*[cache.do(fresh, call(7), expires=expires, since=7) for _ in range(5)])
+
+    asyncio.run(run())
+    assert sent == [100, 40, None, 7]
+    assert len(os.listdir(directory)) == 2
+    shutil.rmtree(directory)
+    print("OHLC polls with moving cursors share one cached response")
+
+
+def test_sweep():
+    directory = tempfile.mkdtemp()
+    cache = SingleFlight(directory=directory)
+
+    async def result():
+        return {"error": [], "result": {}}
+
+    async def run():
+        now = time.time()
+        for i in range(50):
+            await cache.do(["Depth", i], result, expires=now - 1 if i % 2 else now + 60)
+
+    single_flight.SWEEP = 0
+    try:
+        asyncio.run(run())
+    finally:
+        single_flight.SWEEP = 60
+    # only the entries and files that have not expired are left
+    assert len(cache.cache) <= 26
+    assert len(os.listdir(directory)) <= 26
+    shutil.rmtree(directory)
+    print("expired cache entries and files are swept")
+
+
+def test_forming_candle_refreshes():
+    directory = tempfile.mkdtemp()
+    client = KrakenClient(single_flight=SingleFlight(directory=directory), limiter=object(), signer=object(), nonces=object())
+    sent = []
+
+    async def request(method, uri, params=None, headers=None, timeout=None, priority=None):
+        sent.append(time.time())
+        return {"error": [], "result": {"close": len(sent)}}
+
+    client.request = request
+
+    async def run():
+        params = {"pair": "SOLUSD", "interval": 1440}
+        first = await client.public("OHLC", params)
+        # polls right after each other share the response, a tick later the forming candle is fetched again
+        assert await client.public("OHLC", params) is first
+        await asyncio.sleep(0.3)
+        assert (await client.public("OHLC", params))["result"]["close"] == 2
+
+    kraken_client.FORMING = 0.2
+    try:
+        asyncio.run(run())
+    finally:
+        kraken_client.FORMING = 5
+    assert len(sent) == 2
+    shutil.rmtree(directory)
+    print("a cached OHLC response is fetched again inside its candle")
+
+
+if __name__ == "__main__":
+    test_since_shares_one_entry()
+    test_sweep()
+    test_forming_candle_refreshes()
@@ -0,0 +1,156 @@
+# asyncio kraken rest client that keeps one pooled keep-alive session for every call
+import asyncio
+import json
+import os
+import threading
+import time
+import aiohttp
+
+# get kraken signature function
+from src.exchange.kraken.main import KrakenSigner
+from src.exchange.kraken.nonce import NonceCounter
+from src.exchange.kraken.rate_limit import RateLimiter, TRADING_ENDPOINTS
+from src.exchange.kraken.single_flight import SingleFlight, candle_close
+
+API_URL = "https://api.kraken.com"
+# seconds before a single call is given up on
+DEFAULT_TIMEOUT = 10
+# seconds a cached OHLC response answers polls for at most, its last row is the forming candle which moves with
+# every trade. Long enough to share the burst of polls after a close (scheduler DELAY + SPREAD)
+FORMING = 5
+
+
+class KrakenClient:
+    def __init__(self, base_url=API_URL, pool_size=20, timeout=DEFAULT_TIMEOUT, limiter=None, single_flight=None, signer=None, nonces=None):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+        # every call waits for its turn against kraken's counters before it is sent
+        self.limiter = limiter or RateLimiter(os.getenv("KRAKEN_API_TIER", "starter"), key=os.getenv("KRAKEN_API_KEY"))
+        # identical public calls share one request, OHLC results are kept for FORMING seconds at most
+        self.single_flight = single_flight or SingleFlight()
+        # credentials loaded once, every private call (Account, OrderExecution) is signed with the same signer
+        self.signer = signer or KrakenSigner()
+        # strictly increasing nonces shared with every process using the same key, so private calls can overlap
+        self.nonces = nonces or NonceCounter(key=os.getenv("KRAKEN_API_KEY"))
+        # kraken time minus local time, kept up to date by a ServerClock so cached candles expire on kraken's close
+        self.clock_offset = 0.0
+
+    def nonce(self):
+        return str(self.nonces.next())
+
+    async def start(self):
+        # the session has to be created inside the running loop, connections are reused across calls
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(base_url=self.base_url, connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def send(self, method, uri, params=None, data=None, headers=None, timeout=None):
+        session = await self.start()
+        async with session.request(
+            method,
+            uri,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+        ) as response:
+            return await response.json(content_type=None)
+
+    async def request(self, method, uri, params=None, data=None, headers=None, timeout=None, priority=None):
+        """
+        Send one request over the pooled session once the rate limiter allows it and return the parsed json
+        uri: path of the endpoint, e.g. "/0/public/OHLC"
+        Private requests signed by the caller are sent as is, prefer private() so the nonce is taken after any wait.
+        """
+        pair = None
+        if uri.rsplit("/", 1)[-1] in TRADING_ENDPOINTS and data:
+            pair = json.loads(data).get("pair")
+        await self.limiter.schedule(uri, pair=pair, priority=priority)
+        response = await self.send(method, uri, params=params, data=data, headers=headers, timeout=timeout)
+        self.limiter.observe(uri, response, pair=pair)
+        return response
+
+    async def public(self, endpoint, params=None, timeout=None, priority=None):
+        # e.g. public("OHLC", {"pair": "SOLUSD", "interval": 1})
+        params = params or {}
+        expires = None
+        since = None
+        if endpoint == "OHLC":
+            # the candle closes on kraken's clock, the cached response expires at that moment in local time, or
+            # earlier so polls inside the candle see the forming candle move
+            now = time.time()
+            expires = min(candle_close(params.get("interval", 1), now + self.clock_offset) - self.clock_offset, now + FORMING)
+            # every poll moves the cursor, one cached response per pair and interval answers them all
+            since = params.get("since")
+        key = [endpoint, sorted([name, str(value)] for name, value in params.items() if not (endpoint == "OHLC" and name == "since"))]
+        return await self.single_flight.do(
+            key,
+            lambda: self.request(
+                "GET", f"/0/public/{endpoint}", params=params, headers={"Accept": "application/json"}, timeout=timeout, priority=priority
+            ),
+            expires=expires,
+            since=since,
+        )
+
+    async def private(self, endpoint, data=None, timeout=None, priority=None):
+        # e.g. private("Balance"), nonce and signature are added once the call is cleared to go
+        uri = f"/0/private/{endpoint}"
+        data = data or {}
+        await self.limiter.schedule(uri, pair=data.get("pair"), priority=priority)
+        nonce = self.nonce()
+        payload = json.dumps({"nonce": nonce, **data})
+        response = await self.send("POST", uri, data=payload, headers=self.signer.sign(uri, nonce, payload), timeout=timeout)
+        self.limiter.observe(uri, response, pair=data.get("pair"))
+        return response
+
+    async def gather(self, *calls, return_exceptions=False):
+        # run several public/private calls at once over the same pool
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+
+
+class KrakenTransport:
+    """
+    Runs a KrakenClient on a background event loop so the synchronous classes
+    (Account, OrderExecution, OrderBook, the candle store) share its connection pool.
+    """
+    def __init__(self, client=None):
+        self.client = client or KrakenClient()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="kraken-transport", daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine):
+        # block until a coroutine finishes on the transport loop, e.g. run(client.gather(...))
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def request(self, method, uri, params=None, data=None, headers=None, timeout=None, priority=None):
+        return self.run(self.client.request(method, uri, params=params, data=data, headers=headers, timeout=timeout, priority=priority))
+
+    def public(self, endpoint, params=None, timeout=None, priority=None):
+        return self.run(self.client.public(endpoint, params=params, timeout=timeout, priority=priority))
+
+    def private(self, endpoint, data=None, timeout=None, priority=None):
+        return self.run(self.client.private(endpoint, data=data, timeout=timeout, priority=priority))
+
+
+transport = None
+transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    The process wide transport, created on first use
+    """
+    global transport
+    with transport_lock:
+        if transport is None:
+            transport = KrakenTransport()
+        return transport
@@ -0,0 +1,68 @@
+# kraken's clock as seen from here, so candle closes can be timed on the exchange's time instead of the local one
+import threading
+import time
+from src.exchange.kraken.client import get_transport
+
+# seconds between offset measurements, clocks drift slowly
+RESYNC = 600
+
+
+class ServerClock:
+    """
+    Estimate of kraken server time minus local time from the public Time endpoint.
+    Time only has whole seconds: a reply of s between sending at t0 and receiving at t1 means the offset is
+    in [s - t1, s + 1 - t0]. Every sample of a sync narrows that range, the estimate is its middle.
+    """
+    def __init__(self, transport=None, resync=RESYNC):
+        self.transport = transport
+        self.resync = resync
+        self.low = None
+        self.high = None
+        self.synced = None
+        self.lock = threading.Lock()
+
+    def measure(self):
+        if self.transport is None:
+            self.transport = get_transport()
+        sent = time.time()
+        response = self.transport.public("Time")
+        received = time.time()
+        return response["result"]["unixtime"], sent, received
+
+    def observe(self, server, sent, received, reset=False):
+        # narrow the offset range with one sample, start over if asked or if it disagrees with the range (a clock jumped)
+        low, high = server - received, server + 1 - sent
+        with self.lock:
+            if reset or self.low is None or low > self.high or high < self.low:
+                self.low, self.high = low, high
+            else:
+                self.low, self.high = max(self.low, low), min(self.high, high)
+
+    def sync(self, samples=3):
+        """
+        Measure the offset a few times, the first sample that comes back replaces the previous range so the
+        clocks drifting apart since can't leave it stale. If every measurement fails the last estimate is kept
+        """
+        reset = True
+        for sample in range(samples):
+            if sample:
+                # land the samples at different points of kraken's second so their ranges cut each other
+                time.sleep(1 / samples)
+            try:
+                self.observe(*self.measure(), reset=reset)
+                reset = False
+            except Exception as e:
+                print(f"Could not get kraken time: {e}")
+        self.synced = time.time()
+        if self.low is not None and self.transport is not None:
+            self.transport.client.clock_offset = (self.low + self.high) / 2
+
+    def offset(self):
+        # seconds to add to the local clock, 0 until a measurement succeeded
+        if self.synced is None or time.time() - self.synced > self.resync:
+            self.sync()
+        with self.lock:
+            return 0.0 if self.low is None else (self.low + self.high) / 2
+
+    def now(self):
+        return time.time() + self.offset()
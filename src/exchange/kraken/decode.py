@@ -0,0 +1,45 @@
+# decode kraken public payloads straight into float64 numpy arrays
+# kraken sends prices and volumes as strings, np.fromiter parses them in one pass without building object columns
+import itertools
+import numpy as np
+
+# [time, open, high, low, close, vwap, volume, count]
+OHLC_WIDTH = 8
+# [price, volume, timestamp]
+DEPTH_WIDTH = 3
+
+
+def result_rows(data, pair=None):
+    """
+    Get the payload for a pair out of a kraken response.
+    Kraken may answer under its own pair name (XBTUSD -> XXBTZUSD) so without a match the first non cursor key is used.
+    """
+    if data.get("error"):
+        raise ValueError(f"Kraken error for {pair}: {data['error']}")
+    result = data["result"]
+    if pair in result:
+        return result[pair]
+    return next(value for name, value in result.items() if name != "last")
+
+
+def decode_rows(rows, width):
+    return np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width
+    ).reshape(len(rows), width)
+
+
+def decode_ohlc(rows):
+    """
+    OHLC rows -> (n, 8) float64 array, columns time, open, high, low, close, vwap, volume, count
+    """
+    return decode_rows(rows, OHLC_WIDTH)
+
+
+def decode_depth(book):
+    """
+    Depth result for one pair -> {'asks': (n, 3), 'bids': (n, 3)} float64 arrays, columns price, volume, timestamp
+    """
+    return {
+        "asks": decode_rows(book["asks"], DEPTH_WIDTH),
+        "bids": decode_rows(book["bids"], DEPTH_WIDTH),
+    }
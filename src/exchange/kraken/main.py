@@ -5,22 +5,44 @@ import base64
 import json
 import os
 
+
+class KrakenSigner:
+    """
+    API-Sign for private calls with the credentials loaded once: the secret is decoded a single time (on the
+    first signature, so public only use never needs it) and an HMAC-SHA512 already keyed with it is copied for
+    every request instead of being set up again.
+    """
+    def __init__(self, key=None, secret=None):
+        self.key = key if key is not None else os.getenv("KRAKEN_API_KEY")
+        self.secret = secret if secret is not None else os.getenv("KRAKEN_API_SECRET")
+        self.mac = None
+        self.headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "API-Key": self.key,
+        }
+
+    def signature(self, urlpath, nonce, body):
+        """
+        base64(HMAC-SHA512(urlpath + SHA256(nonce + body), secret)), body is the request body exactly as sent
+        """
+        if self.mac is None:
+            if not self.secret:
+                raise ValueError("KRAKEN_API_SECRET is not set")
+            self.mac = hmac.new(base64.b64decode(self.secret), digestmod=hashlib.sha512)
+        mac = self.mac.copy()
+        mac.update(urlpath.encode() + hashlib.sha256((str(nonce) + body).encode()).digest())
+        return base64.b64encode(mac.digest()).decode()
+
+    def sign(self, urlpath, nonce, body):
+        # headers for a json body that already holds `nonce`, nothing is parsed back out of it
+        return {**self.headers, "API-Sign": self.signature(urlpath, nonce, body)}
+
+
 def get_kraken_signature(urlpath, data):
-    key = os.getenv("KRAKEN_API_KEY")
-    secret = os.getenv("KRAKEN_API_SECRET")
+    # one off signing that reads the credentials from the environment, the client keeps a KrakenSigner instead
     if isinstance(data, str):
-        encoded = (str(json.loads(data)["nonce"]) + data).encode()
+        nonce, body = json.loads(data)["nonce"], data
     else:
-        encoded = (str(data["nonce"]) + urllib.parse.urlencode(data)).encode()
-    message = urlpath.encode() + hashlib.sha256(encoded).digest()
-
-    mac = hmac.new(base64.b64decode(secret), message, hashlib.sha512)
-    sigdigest = base64.b64encode(mac.digest()).decode()
-    
-    # construct the headers
-    return {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "API-Key": key,
-        "API-Sign": sigdigest,
-    }
+        nonce, body = data["nonce"], urllib.parse.urlencode(data)
+    return KrakenSigner().sign(urlpath, nonce, body)
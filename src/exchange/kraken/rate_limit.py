@@ -0,0 +1,281 @@
+# model kraken's decaying call counters and pace requests so they never hit the rate limit
+import asyncio
+import fcntl
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import socket
+import tempfile
+import time
+import uuid
+
+# (max counter, decay per second) for the private REST counter by verification tier
+PRIVATE_TIERS = {
+    "starter": (15, 0.33),
+    "intermediate": (20, 0.5),
+    "pro": (20, 1.0),
+}
+# (max counter, decay per second) for the per pair trading counter used by AddOrder/CancelOrder
+TRADING_TIERS = {
+    "starter": (60, 1.0),
+    "intermediate": (125, 2.34),
+    "pro": (180, 3.75),
+}
+# public endpoints are limited per ip at about one call a second with a small burst
+PUBLIC_LIMIT = (15, 1.0)
+
+# private endpoints that do not cost 1, order placement is not counted here but on the trading counter
+PRIVATE_COSTS = {
+    "ClosedOrders": 2,
+    "QueryOrders": 2,
+    "TradesHistory": 2,
+    "QueryTrades": 2,
+    "Ledgers": 2,
+    "QueryLedgers": 2,
+    "AddOrder": 0,
+    "AddOrderBatch": 0,
+    "EditOrder": 0,
+    "CancelOrder": 0,
+}
+TRADING_ENDPOINTS = {"AddOrder", "AddOrderBatch", "EditOrder", "CancelOrder"}
+
+# request priorities, lower goes first
+ORDER = 0
+ACCOUNT = 1
+MARKET_DATA = 2
+
+# a process waiting at the head of a counter's queue checks in at least this often, and a waiter that hasn't for
+# STALE seconds (its process died) is dropped
+HEARTBEAT = 1.0
+STALE = 5.0
+# how often a request that is behind another process's waiter checks again
+POLL = 0.05
+
+RATE_LIMIT_ERRORS = ("EAPI:Rate limit exceeded", "EOrder:Rate limit exceeded", "EGeneral:Too many requests")
+
+
+class CallCounter:
+    """
+    Kraken style counter: every call adds its cost, the counter decays linearly and calls above the max are rejected.
+    With a path the counter is kept in a locked file so every process using the same key shares it, together with
+    the head waiter of each process so the best one across all of them goes first.
+    """
+    def __init__(self, limit, decay, path=None):
+        self.limit = limit
+        self.decay = decay
+        self.path = path
+        self.level = 0.0
+        self.updated = time.time()
+        # waiting requests of this process as (priority, sequence), only the head may take from the counter
+        self.queue = []
+        # waiter id -> [priority, waiting since, last check in] of each process's head, in the file when shared
+        self.waiting = {}
+        # this process's entry in waiting
+        self.id = uuid.uuid4().hex
+        self.listed = False
+
+    def decayed(self, level, updated, now):
+        return max(0.0, level - (now - updated) * self.decay)
+
+    def update(self, change):
+        """
+        change(level, waiting) -> (new level, result), applied atomically to the (possibly shared) counter,
+        waiting may be changed in place
+        """
+        now = time.time()
+        if self.path is None:
+            self.level, result = change(self.decayed(self.level, self.updated, now), self.waiting)
+            self.updated = now
+            return result
+        with open(self.path, "a+") as state:
+            fcntl.flock(state, fcntl.LOCK_EX)
+            state.seek(0)
+            saved = json.loads(state.read() or '{"level": 0, "updated": 0}')
+            waiting = saved.get("waiting", {})
+            level, result = change(self.decayed(saved["level"], saved["updated"], now), waiting)
+            state.seek(0)
+            state.truncate()
+            state.write(json.dumps({"level": level, "updated": now, "waiting": waiting}))
+            return result
+
+    def reserve(self, cost, waiter=None):
+        """
+        Take cost from the counter if it fits and return 0, otherwise return the seconds until it will fit.
+        waiter: (priority, waiting since) of the request, it is listed while it waits and nothing is taken while a
+        better waiter of another process is listed
+        """
+        def change(level, waiting):
+            now = time.time()
+            for other in [other for other, (_, _, seen) in waiting.items() if now - seen > STALE]:
+                del waiting[other]
+            if waiter is not None:
+                if any((priority, since) < tuple(waiter) for other, (priority, since, _) in waiting.items() if other != self.id):
+                    waiting[self.id] = [*waiter, now]
+                    self.listed = True
+                    return level, POLL
+            if level + cost <= self.limit:
+                waiting.pop(self.id, None)
+                self.listed = False
+                return level + cost, 0
+            if waiter is not None:
+                waiting[self.id] = [*waiter, now]
+                self.listed = True
+            return level, (level + cost - self.limit) / self.decay
+        return self.update(change)
+
+    def leave(self):
+        # take this process's waiter off the list once nothing of it waits anymore
+        if self.listed:
+            self.listed = False
+
+            def change(level, waiting):
+                waiting.pop(self.id, None)
+                return level, None
+            self.update(change)
+
+    def room(self, cost):
+        # seconds until cost fits under the limit, 0 if it does now, without taking anything
+        def change(level, waiting):
+            return level, max(0.0, level + cost - self.limit) / self.decay
+        return self.update(change)
+
+    def release(self, cost):
+        # give back a reservation that could not be used
+        self.update(lambda level, waiting: (max(0.0, level - cost), None))
+
+    def saturate(self):
+        # kraken rejected a call so our model was behind, treat the counter as full
+        self.update(lambda level, waiting: (self.limit, None))
+
+
+class RateLimiter:
+    """
+    Queues and paces public, private and trading calls against kraken's counters.
+    Waiters are served by priority so orders go before account polling and account polling before market data,
+    across processes as well: each process lists its best waiter with the shared counter and holds back while
+    another process lists a better one.
+    Private and trading counters are shared between the processes using the same api key, the public one between
+    every process on the host since kraken counts public calls per ip.
+    """
+    def __init__(self, tier="starter", key=None, shared=True, host=None):
+        self.tier = tier
+        self.shared = shared
+        self.prefix = hashlib.sha256((key or "").encode()).hexdigest()[:16]
+        self.host = hashlib.sha256((host or socket.gethostname()).encode()).hexdigest()[:16]
+        self.public = CallCounter(*PUBLIC_LIMIT, path=self.state_path("public", self.host))
+        self.private = CallCounter(*PRIVATE_TIERS[tier], path=self.state_path("private"))
+        self.trading = {}
+        self.sequence = itertools.count()
+        # one condition for every counter, a request drawing from two of them waits on both
+        self.condition = None
+
+    def state_path(self, name, prefix=None):
+        if not self.shared:
+            return None
+        return os.path.join(tempfile.gettempdir(), f"kraken-rate-limit-{prefix or self.prefix}-{name}.json")
+
+    def trading_counter(self, pair):
+        if pair not in self.trading:
+            self.trading[pair] = CallCounter(*TRADING_TIERS[self.tier], path=self.state_path(f"trading-{pair}"))
+        return self.trading[pair]
+
+    def counters(self, uri, pair=None):
+        """
+        [(counter, cost)] a request to uri draws from, pair is needed for the trading endpoints
+        """
+        endpoint = uri.rsplit("/", 1)[-1]
+        if "/public/" in uri:
+            return [(self.public, 1)]
+        counters = [(self.private, PRIVATE_COSTS.get(endpoint, 1))]
+        if endpoint in TRADING_ENDPOINTS and pair:
+            counters.append((self.trading_counter(pair), 1))
+        return counters
+
+    def priority(self, uri):
+        endpoint = uri.rsplit("/", 1)[-1]
+        if endpoint in TRADING_ENDPOINTS:
+            return ORDER
+        if "/private/" in uri:
+            return ACCOUNT
+        return MARKET_DATA
+
+    async def wait(self, seconds):
+        # until another request changed a counter or seconds passed, None waits for a change only
+        try:
+            await asyncio.wait_for(self.condition.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def acquire(self, counters, priority):
+        """
+        Wait for our turn in the queue of the first counter and until the cost fits under every counter's limit,
+        then take from all of them at once. A request only queues while the other counters (the pair's trading
+        counter) have room and holds nothing while it waits, so an order waiting on its pair doesn't hold up the
+        private calls behind it
+        """
+        counters = [(counter, cost) for counter, cost in counters if cost]
+        if not counters:
+            return
+        (counter, cost), others = counters[0], counters[1:]
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            while True:
+                while others:
+                    wait = max(other.room(other_cost) for other, other_cost in others)
+                    if wait == 0:
+                        break
+                    await self.wait(wait)
+                entry = (priority, next(self.sequence))
+                since = time.time()
+                heapq.heappush(counter.queue, entry)
+                # a new head may have arrived, let the current one re-check
+                self.condition.notify_all()
+                try:
+                    while True:
+                        wait = None
+                        if counter.queue[0] == entry:
+                            wait = counter.reserve(cost, (priority, since))
+                            if wait == 0:
+                                if self.reserve_all(others):
+                                    return
+                                # another process took the room on the other counters meanwhile, queue again once it is back
+                                counter.release(cost)
+                                break
+                            # check in again before the listing goes stale
+                            wait = min(wait, HEARTBEAT)
+                        await self.wait(wait)
+                finally:
+                    counter.queue.remove(entry)
+                    heapq.heapify(counter.queue)
+                    if not counter.queue:
+                        counter.leave()
+                    self.condition.notify_all()
+
+    def reserve_all(self, counters):
+        # take from every counter or from none
+        taken = []
+        for counter, cost in counters:
+            if counter.reserve(cost) != 0:
+                for counter, cost in taken:
+                    counter.release(cost)
+                return False
+            taken.append((counter, cost))
+        return True
+
+    async def schedule(self, uri, pair=None, priority=None):
+        """
+        Block until a request to uri may be sent
+        """
+        if priority is None:
+            priority = self.priority(uri)
+        await self.acquire(self.counters(uri, pair), priority)
+
+    def observe(self, uri, response, pair=None):
+        # keep the model in line with kraken when it still rejects a call
+        errors = (response.get("error") or []) if isinstance(response, dict) else []
+        if any(error.startswith(RATE_LIMIT_ERRORS) for error in errors):
+            for counter, _ in self.counters(uri, pair):
+                counter.saturate()
@@ -0,0 +1,130 @@
+# share one in flight call and its parsed result between identical market data requests
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+def candle_close(interval, now=None):
+    """
+    Unix time the candle of `interval` minutes forming at `now` closes, candles are aligned to the epoch
+    """
+    now = time.time() if now is None else now
+    seconds = int(interval) * 60
+    return now - now % seconds + seconds
+
+
+# seconds between sweeps of the expired cache entries and files
+SWEEP = 60
+
+
+class SingleFlight:
+    """
+    Identical requests (same key) running at the same time wait on one call instead of sending their own.
+    Results given an expiry are cached until then, in memory and, when shared, in a temp directory
+    so the other processes on the host (bot loop, convergence tape, flask) can reuse them.
+    A request may pass a `since` cursor left out of its key: a cached result fetched from an earlier (or no)
+    cursor holds every row it asks for, so it is reused, callers merge the rows by time.
+    Expired entries and files are swept every SWEEP seconds, so the cache holds about one result per key.
+    Results are shared between callers so they must not be mutated.
+    """
+    def __init__(self, shared=True, directory=None):
+        self.shared = shared
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "kraken-cache")
+        self.inflight = {}
+        # json key -> (expires, since, result)
+        self.cache = {}
+        self.swept = 0.0
+
+    def path(self, identity):
+        digest = hashlib.sha256(identity.encode()).hexdigest()[:24]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def covers(self, cached_since, since):
+        # rows fetched from cached_since include every row a request from since wants
+        return cached_since is None or (since is not None and float(cached_since) <= float(since))
+
+    def cached(self, identity, now, since=None):
+        if identity in self.cache:
+            expires, cached_since, result = self.cache[identity]
+            if expires > now and self.covers(cached_since, since):
+                return result
+        if self.shared:
+            try:
+                with open(self.path(identity)) as saved:
+                    expires, cached_since, result = json.load(saved)
+            except (OSError, ValueError):
+                return None
+            if expires > now and self.covers(cached_since, since):
+                self.cache[identity] = (expires, cached_since, result)
+                return result
+        return None
+
+    def store(self, identity, expires, since, result):
+        now = time.time()
+        # keep the result that covers more if the cached one is still valid
+        if identity in self.cache:
+            cached_expires, cached_since, _ = self.cache[identity]
+            if cached_expires > now and not self.covers(since, cached_since):
+                return
+        self.cache[identity] = (expires, since, result)
+        if self.shared:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(identity)
+            # write then rename so other processes never read half a file
+            temporary = f"{path}.{os.getpid()}"
+            with open(temporary, "w") as saved:
+                json.dump([expires, since, result], saved)
+            # the modification time is the expiry so the sweep doesn't have to read the files
+            os.utime(temporary, (expires, expires))
+            os.replace(temporary, path)
+        if now - self.swept > SWEEP:
+            self.sweep(now)
+
+    def sweep(self, now):
+        """
+        Drop the expired entries, and the expired files of every process
+        """
+        self.swept = now
+        for identity in [identity for identity, (expires, _, _) in self.cache.items() if expires <= now]:
+            del self.cache[identity]
+        if not self.shared:
+            return
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime <= now:
+                    os.remove(entry.path)
+            except OSError:
+                # another process swept it first
+                pass
+
+    async def do(self, key, call, expires=None, since=None):
+        """
+        Run call() for key unless the same key is already running or cached
+        key: json serializable identity of the request, e.g. ["OHLC", [["interval", "1"], ["pair", "SOLUSD"]]]
+        expires: unix time the result stays valid until, None to only share the in flight call
+        since: cursor the call fetches from, not part of key, a result cached from an earlier cursor is reused
+        """
+        identity = json.dumps(key)
+        result = self.cached(identity, time.time(), since)
+        if result is not None:
+            return result
+        flight = (identity, since)
+        if flight in self.inflight:
+            return await asyncio.shield(self.inflight[flight])
+        future = asyncio.ensure_future(call())
+        self.inflight[flight] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            self.inflight.pop(flight, None)
+        # don't hold on to kraken errors
+        if expires is not None and not result.get("error"):
+            self.store(identity, expires, since, result)
+        return result
@@ -1,43 +1,33 @@
 # execute trades through the Kraken API
-import requests
-import json
-import time
-# get kraken signature function
-from src.exchange.kraken.main import get_kraken_signature
+# pooled kraken transport, signs private calls once the rate limiter lets them through
+from src.exchange.kraken.client import get_transport
 
 # make this a class so getting data and calculating the strategy can be done in one call
 class OrderExecution: 
-    def __init__(self, exchange='kraken'):
+    def __init__(self, exchange='kraken', transport=None):
         self.exchange = exchange
-        self.headers = get_kraken_signature
-
-    def nonce(self):
-        return str(int(time.time() * 1000))
+        self.transport = transport or get_transport()
     
     # execute order through the Kraken API
     def executeOrder(self, order_type, type, volume, pair, price=None):
 
-        url = "https://api.kraken.com/0/private/AddOrder"
-        uri = "/0/private/AddOrder"
-
-        payload = json.dumps({
-            "nonce": self.nonce(),
+        payload = {
             "ordertype": order_type,
             "type": type,
             "volume": volume,
             "pair": pair,
-        })
+        }
 
         if order_type == "limit":
-            payload = json.dumps({
-                "nonce": self.nonce(),
+            payload = {
                 "ordertype": order_type,
                 "type": type,
                 "volume": volume,
                 "pair": pair,
                 "price": price
-            })
+            }
 
-        response = requests.request("POST", url, headers=self.headers(uri, payload), data=payload)
+        # orders go ahead of any queued account or market data calls
+        response = self.transport.private("AddOrder", payload)
 
-        return response.json()
\ No newline at end of file
+        return response
@@ -1,21 +1,22 @@
 # get current order book data from the Kraken API for a specific pair
-import requests
+from src.exchange.kraken.decode import result_rows, decode_depth
+from src.exchange.kraken.client import get_transport
 
 class OrderBook:
-    def __init__(self, pair):
+    def __init__(self, pair, transport=None):
         self.pair = pair
+        self.transport = transport or get_transport()
 
     def get_order_book_data(self):
-        url = "https://api.kraken.com/0/public/Depth"
         querystring = {
             "pair": self.pair
         }
-        response = requests.request("GET", url, params=querystring)
-        data = response.json()
-        # format the data to floats
-        data['result'][self.pair]['asks'] = [[float(ask[0]), float(ask[1])] for ask in data['result'][self.pair]['asks']]
-        data['result'][self.pair]['bids'] = [[float(bid[0]), float(bid[1])] for bid in data['result'][self.pair]['bids']]
-        return data
+        response = self.transport.public("Depth", querystring)
+        return self.decode(response)
+
+    def decode(self, response):
+        # decode straight to float arrays, columns are price, volume, timestamp
+        return decode_depth(result_rows(response, self.pair))
 
     # get the current order book data
     def orderBookData(self):
@@ -29,22 +30,25 @@ class OrderBook:
         spread = 150
         spread_percentage = 0.5
         """
-        data = self.get_order_book_data()
+        return self.summarize(self.get_order_book_data())
+
+    def summarize(self, book):
+        # orderBookData of an already decoded book, e.g. one fetched together with other calls
+        asks = book['asks']
+        bids = book['bids']
         # calculate the spread 
-        ask = data['result'][self.pair]['asks'][0][0]
-        bid = data['result'][self.pair]['bids'][0][0]
+        ask = float(asks[0, 0])
+        bid = float(bids[0, 0])
         spread = ask - bid
-        data['result'][self.pair]['spread'] = spread
         # calculate the spread percentage
         spread_percentage = spread / ask * 100
-        data['result'][self.pair]['spread_percentage'] = spread_percentage
 
         # format to return
         data = {
-            'bid_prices': [bid[0] for bid in data['result'][self.pair]['bids']],
-            'bid_quantities': [bid[1] for bid in data['result'][self.pair]['bids']],
-            'ask_prices': [ask[0] for ask in data['result'][self.pair]['asks']],
-            'ask_quantities': [ask[1] for ask in data['result'][self.pair]['asks']],
+            'bid_prices': bids[:, 0].tolist(),
+            'bid_quantities': bids[:, 1].tolist(),
+            'ask_prices': asks[:, 0].tolist(),
+            'ask_quantities': asks[:, 1].tolist(),
             'spread': spread,
             'spread_percentage': spread_percentage
         }
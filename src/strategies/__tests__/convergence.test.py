@@ -0,0 +1,105 @@
+import numpy as np
+from src.data.candle_buffer import TIME
+from src.data.candle_store import CandleStore
+from src.data.resample import CandleResampler, bucket_start
+from src.strategies.convergence import ConvergenceTape
+from src.strategies.macd import MACD
+from src.strategies.pv_wave import Wave_Strat
+
+# fake exchange: a random walk of 1 minute candles where the last one is still forming
+rng = np.random.default_rng(20)
+START = 1_700_000_000 - 1_700_000_000 % 86400
+N = 3000
+close = 100 + np.cumsum(rng.normal(size=N))
+minutes = np.column_stack([START + 60 * np.arange(N), close, close + 1, close - 1, close, close, np.ones(N), np.ones(N)])
+signal_map = {"1": 1.6, "5": 3, "15": 5, "60": 8}
+
+
+def aggregate(rows, interval):
+    buckets = bucket_start(rows[:, TIME], interval)
+    out = []
+    for bucket in np.unique(buckets):
+        group = rows[buckets == bucket]
+        out.append([bucket, group[0, 1], group[:, 2].max(), group[:, 3].min(), group[-1, 4], group[-1, 5], len(group), len(group)])
+    return np.array(out)
+
+
+class FakeStore(CandleStore):
+    def __init__(self):
+        super().__init__()
+        self.now = 1500
+
+    def get_ohlc_data(self, pair, interval, since=None):
+        rows = minutes[:self.now]
+        if str(interval) != "1":
+            return aggregate(rows, interval)[-720:], 0
+        if since is not None:
+            rows = rows[rows[:, TIME] >= since]
+        return rows[-720:], rows[-2, TIME]
+
+
+# every snapshot is what evaluating the intervals one after another on the same refresh gives
+def test_matches_sequential(processes):
+    store = FakeStore()
+    tape = ConvergenceTape("SOLUSD", signal_map, processes=processes, feed=CandleResampler("SOLUSD", signal_map, store=store))
+    feed = CandleResampler("SOLUSD", signal_map, store=store)
+    macds = {}
+    try:
+        for step in range(40):
+            time, results = tape.snapshot()
+            feed.refresh()
+            assert time == minutes[store.now - 1, TIME]
+            assert [result["interval"] for result in results] == list(signal_map)
+            for result in results:
+                interval = result["interval"]
+                candles = feed.candles(interval)
+                strategy = Wave_Strat("SOLUSD", interval, signal_delay=0, prominence=signal_map[interval], distance=10, level=1, candles=candles)
+                if interval not in macds:
+                    macds[interval] = MACD("SOLUSD", interval, candles=candles)
+                assert result["last_non_zero_position"] == strategy.get_last_signal()["last_non_zero_position"], (step, interval)
+                assert result["last_macd_signal"] == macds[interval].macdStrategy()["last_signal"], (step, interval)
+                assert result["current_close_price"] == candles.close[-1]
+            store.now += 1 if step % 5 else 4
+    finally:
+        tape.close()
+    print(f"convergence tape (processes={processes}) matches the intervals evaluated one by one")
+
+
+class ScaledStore(FakeStore):
+    # another pair: the same walk at three times the price
+    def get_ohlc_data(self, pair, interval, since=None):
+        rows, last = super().get_ohlc_data(pair, interval, since)
+        rows = rows.copy()
+        rows[:, 1:6] *= 3
+        return rows, last
+
+
+# two pairs in one process on thread pools don't share buffers or MACD state
+def test_two_assets():
+    stores = {"SOLUSD": FakeStore(), "ETHUSD": ScaledStore()}
+    tapes = {asset: ConvergenceTape(asset, signal_map, processes=False, feed=CandleResampler(asset, signal_map, store=store)) for asset, store in stores.items()}
+    feeds = {asset: CandleResampler(asset, signal_map, store=store) for asset, store in stores.items()}
+    macds = {}
+    try:
+        for step in range(20):
+            for asset, tape in tapes.items():
+                _, results = tape.snapshot()
+                feeds[asset].refresh()
+                for result in results:
+                    interval = result["interval"]
+                    candles = feeds[asset].candles(interval)
+                    if (asset, interval) not in macds:
+                        macds[asset, interval] = MACD(asset, interval, candles=candles)
+                    assert result["last_macd_signal"] == macds[asset, interval].macdStrategy()["last_signal"], (step, asset, interval)
+                    assert result["current_close_price"] == candles.close[-1]
+                stores[asset].now += 1 if step % 5 else 4
+    finally:
+        for tape in tapes.values():
+            tape.close()
+    print("convergence tapes of two pairs keep their own state")
+
+
+if __name__ == "__main__":
+    test_matches_sequential(False)
+    test_matches_sequential(True)
+    test_two_assets()
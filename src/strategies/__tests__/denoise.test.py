@@ -0,0 +1,38 @@
+import warnings
+import numpy as np
+import pywt
+from src.strategies.denoise import StreamingDenoiser
+
+# level 2 and 3 on short windows warn about boundary effects, the batch output is still what we compare against
+warnings.simplefilter("ignore", UserWarning)
+rng = np.random.default_rng(3)
+
+
+def batch(x, level):
+    # Wave_Strat.denoise_close without a denoiser
+    coeffs = pywt.wavedec(x, 'db8', level=level)
+    coeffs[1:] = [pywt.threshold(i, value=0.05*i.max(), mode='soft') for i in coeffs[1:]]
+    return pywt.waverec(coeffs, 'db8')[:len(x)]
+
+
+# the window grows until it holds 300 candles then slides, the forming candle is revised between new candles
+# and every so often the feed jumps ahead further than the window
+def test_matches_batch(level):
+    denoiser = StreamingDenoiser(level=level)
+    series = list(100 + np.cumsum(rng.normal(size=50)))
+    for _ in range(1000):
+        step = rng.random()
+        if step < 0.6:
+            series[-1] += rng.normal()
+        elif step < 0.99:
+            series.append(series[-1] + rng.normal())
+        else:
+            series.extend(series[-1] + np.cumsum(rng.normal(size=400)))
+        start = max(0, len(series) - 300)
+        window = np.array(series[start:])
+        assert np.allclose(denoiser.denoise(window, start), batch(window, level), rtol=0, atol=1e-9)
+    print(f"level {level} matches the batch denoise")
+
+
+for level in (1, 2, 3):
+    test_matches_batch(level)
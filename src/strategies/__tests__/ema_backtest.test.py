@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from src.strategies.ema_backtest import ema_matrix, crossover_backtest, RangeStats
+
+rng = np.random.default_rng(7)
+
+
+def single_pair(close, short, long, fee, lag):
+    # the straightforward version: one ewm per span, the whole position and equity curve spelled out
+    above = (pd.Series(close).ewm(span=short).mean() > pd.Series(close).ewm(span=long).mean()).values
+    n = len(close)
+    position = np.zeros(n, dtype=bool)
+    position[lag + 1:] = above[:n - lag - 1]
+    changes = np.zeros(n, dtype=bool)
+    changes[:-1] = position[1:] != position[:-1]
+    returns = np.zeros(n)
+    returns[1:] = np.log(close[1:] / close[:-1])
+    equity = np.cumsum(np.where(position, returns, 0) + changes * np.log1p(-fee))
+    high = np.maximum.accumulate(np.maximum(equity, 0))
+    return np.expm1(equity[-1]), np.expm1((equity - high).min()), changes.sum()
+
+
+def test_ema_matrix():
+    close = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=2000)))
+    spans = [1, 2, 12, 26, 100]
+    for adjust in (True, False):
+        emas = ema_matrix(close, spans, adjust)
+        for row, span in enumerate(spans):
+            assert np.allclose(emas[row], pd.Series(close).ewm(span=span, adjust=adjust).mean(), rtol=1e-12)
+    print("ema_matrix matches pandas ewm")
+
+
+def test_range_stats():
+    x = np.cumsum(rng.normal(size=1000))
+    stats = RangeStats(x)
+    first, last = np.sort(rng.integers(0, len(x), size=(2, 5000)), axis=0)
+    high, low, drop = stats.query(first, last)
+    for i in range(len(first)):
+        window = x[first[i]:last[i] + 1]
+        assert high[i] == window.max() and low[i] == window.min()
+        assert np.isclose(drop[i], (np.maximum.accumulate(window) - window).max())
+    print("RangeStats matches the ranges it looks up")
+
+
+# every pair of the grid gives what the one pair at a time version gives
+def test_matches_single_pair():
+    spans = list(range(1, 15)) + [30, 60]
+    for _ in range(5):
+        n = int(rng.integers(5, 3000))
+        close = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=n)))
+        lag = int(rng.integers(0, 3))
+        results = crossover_backtest(close, spans, fee=0.004, lag=lag)
+        for short in spans:
+            for long in spans:
+                if long <= short:
+                    assert np.isnan(results["total_return"].loc[short, long])
+                    continue
+                total_return, max_drawdown, trades = single_pair(close, short, long, 0.004, lag)
+                assert np.isclose(results["total_return"].loc[short, long], total_return, rtol=1e-9, atol=1e-12)
+                assert np.isclose(results["max_drawdown"].loc[short, long], max_drawdown, rtol=1e-9, atol=1e-12)
+                assert results["trades"].loc[short, long] == trades
+    print("crossover_backtest matches every pair run on its own")
+
+
+test_ema_matrix()
+test_range_stats()
+test_matches_single_pair()
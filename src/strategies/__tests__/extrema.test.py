@@ -0,0 +1,37 @@
+import numpy as np
+from scipy.signal import find_peaks
+from src.strategies.extrema import ExtremaTable
+
+rng = np.random.default_rng(5)
+
+
+# one table answers every threshold the way separate find_peaks calls would, exact ties included
+def test_table():
+    for _ in range(50):
+        x = np.round(np.cumsum(rng.normal(size=int(rng.integers(0, 800)))), 1)
+        table = ExtremaTable(x)
+        thresholds = [(prominence, distance) for prominence in (None, 0, 0.5, 1.6, 3, 17) for distance in (None, 1, 1.5, 10, 25)]
+        for (prominence, distance), (peaks, valleys) in table.sweep(thresholds).items():
+            assert np.array_equal(peaks, find_peaks(x, prominence=prominence, distance=distance)[0])
+            assert np.array_equal(valleys, find_peaks(-x, prominence=prominence, distance=distance)[0])
+    print("ExtremaTable matches find_peaks for every threshold")
+
+
+# exactly equal heights within distance of each other, ranked like find_peaks ranks them
+def test_ties():
+    for _ in range(200):
+        x = rng.integers(0, 4, size=int(rng.integers(2, 300))).astype(float)
+        table = ExtremaTable(x)
+        for distance in (2, 3, 7.5, 40):
+            assert np.array_equal(table.select(distance=distance)[0], find_peaks(x, distance=distance)[0])
+    for distance in (0, 0.5, -1):
+        try:
+            ExtremaTable(x).select(distance=distance)
+        except ValueError:
+            continue
+        raise AssertionError(f"distance {distance} accepted")
+    print("ties come out like find_peaks and a distance below 1 is rejected")
+
+
+test_table()
+test_ties()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from src.data.candle_buffer import CandleBuffer
+from src.strategies.indicators import StreamingEMA, StreamingMACD, CandleTracker
+
+# random walk of closes, the buffer holds the last 720 like the candle store
+rng = np.random.default_rng(11)
+N = 2000
+close = 100 + np.cumsum(rng.normal(size=N))
+
+
+def candle(i, price):
+    return [60 * i, price, price, price, price, price, 1, 1]
+
+
+def batch_macd(series):
+    series = pd.Series(series)
+    macd = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return macd.iloc[-1], signal.iloc[-1]
+
+
+# the forming candle is revised a few times before it closes, like repeated polls within one interval
+def test_tracker_matches_ewm_on_the_window():
+    buffer = CandleBuffer(720)
+    ema = CandleTracker(lambda: StreamingEMA(26))
+    macd = CandleTracker(StreamingMACD)
+    for i in range(N):
+        for revision in rng.normal(size=3):
+            forming = close[i] + revision
+            buffer.drop_from(60 * i)
+            buffer.append(candle(i, forming))
+            window = buffer.close.copy()
+            closed, value = ema.update(buffer)
+            assert np.isclose(value, pd.Series(window).ewm(span=26).mean().iloc[-1], rtol=1e-12, atol=0)
+            if len(window) > 1:
+                assert np.isclose(closed, pd.Series(window[:-1]).ewm(span=26).mean().iloc[-1], rtol=1e-12, atol=0)
+            _, (line, signal, histogram) = macd.update(buffer)
+            expected_line, expected_signal = batch_macd(window)
+            assert np.isclose(line, expected_line, rtol=1e-9, atol=1e-12)
+            assert np.isclose(signal, expected_signal, rtol=1e-9, atol=1e-12)
+            assert histogram == line - signal
+    print("tracker matches ewm on the window")
+
+
+def test_reset_when_history_is_replaced():
+    buffer = CandleBuffer(720)
+    buffer.extend(np.array([candle(i, close[i]) for i in range(100)]))
+    tracker = CandleTracker(lambda: StreamingEMA(12))
+    tracker.update(buffer)
+    # a whole new window, none of the pushed candles are left
+    buffer = CandleBuffer(720)
+    buffer.extend(np.array([candle(i, close[i]) for i in range(1000, 1100)]))
+    _, value = tracker.update(buffer)
+    assert np.isclose(value, pd.Series(close[1000:1100]).ewm(span=12).mean().iloc[-1], rtol=1e-12)
+    print("tracker restarts on replaced history")
+
+
+test_tracker_matches_ewm_on_the_window()
+test_reset_when_history_is_replaced()
@@ -0,0 +1,36 @@
+import numpy as np
+from src.data.candle_buffer import CandleBuffer
+from src.strategies.pv_wave import Wave_Strat
+from src.strategies.point_in_time import point_in_time_signals, SIGNAL_COLUMNS
+
+rng = np.random.default_rng(13)
+
+
+def history(n):
+    close = 100 + np.cumsum(rng.normal(size=n))
+    return np.column_stack([np.arange(n) * 60, close, close, close, close, close, np.ones(n), np.ones(n)])
+
+
+# every row is what a Wave_Strat built on the candles up to that row gives, sliding and growing windows
+def test_matches_wave_strat(window, warmup):
+    candles = history(600)
+    replay = point_in_time_signals(candles, signal_delay=2, prominence=1.0, distance=10, level=1, window=window, warmup=warmup)
+    buffer = CandleBuffer(window or len(candles))
+    for t, row in enumerate(candles):
+        buffer.append(row)
+        if t < warmup:
+            assert np.isnan(replay['last_signal'].iloc[t])
+            continue
+        expected = Wave_Strat("SOLUSD", '1', signal_delay=2, prominence=1.0, distance=10, level=1, candles=buffer).get_last_signal()
+        for column in SIGNAL_COLUMNS:
+            value = replay[column].iloc[t]
+            if expected[column] is None:
+                assert np.isnan(value)
+            else:
+                assert np.isclose(value, expected[column], rtol=0, atol=1e-12), (t, column, value, expected[column])
+        assert replay['position'].iloc[t] == (expected['last_non_zero_position'] == 1)
+    print(f"window {window} matches Wave_Strat at every candle")
+
+
+test_matches_wave_strat(200, 200)
+test_matches_wave_strat(None, 100)
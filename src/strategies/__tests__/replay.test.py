@@ -0,0 +1,78 @@
+import tempfile
+import numpy as np
+from src.data.archive import CandleArchive
+from src.execution.profit_loss_logic import ProfitLossLogic
+from src.strategies.point_in_time import point_in_time_signals
+from src.strategies.replay import replay, replay_many, replay_job, fill_price, synthetic_book
+
+rng = np.random.default_rng(17)
+
+
+def history(n):
+    close = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=n)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(scale=0.001, size=n))
+    return np.column_stack([np.arange(n) * 60, open_, close, close, close, close, rng.uniform(1, 5, size=n), np.ones(n)])
+
+
+def test_fill_price():
+    book = synthetic_book(100.0, 3.0, spread=0.002, levels=3, step=0.001)
+    assert np.isclose(fill_price(book, "buy", 0.5), 100.1)
+    assert np.isclose(fill_price(book, "sell", 0.5), 99.9)
+    # walks two levels, same as calculate_effective_price
+    assert np.isclose(fill_price(book, "buy", 1.5), ProfitLossLogic().calculate_effective_price(book['ask_prices'], book['ask_quantities'], 1.5))
+    # more than the book holds, the rest at the last level
+    assert np.isclose(fill_price(book, "sell", 6.0), (99.9 + 99.8 + 99.7 + 3 * 99.7) / 6)
+    assert fill_price(synthetic_book(100.0, 0.0), "buy", 1.0) is None
+    print("fill_price walks the book")
+
+
+# the orders are the positions of the point in time replay traded by run_wave's rule, filled at the next open
+def test_matches_signals():
+    candles = history(1500)
+    window, size, fee = 200, 0.5, 0.004
+    trades, equity, missed = replay(candles, size, '1', signal_delay=1, prominence=1.5, distance=10, level=1, fee=fee, window=window,
+                                    books=lambda row: synthetic_book(row[1], row[6], depth=np.inf))
+    assert missed == 0
+    signals = point_in_time_signals(candles, signal_delay=1, prominence=1.5, distance=10, level=1, window=window, warmup=window - 1)
+    position = signals['last_non_zero_position'].values
+    holding = False
+    expected = []
+    for t in range(window - 1, len(candles) - 1):
+        if position[t] == 1 and not holding:
+            expected.append((t + 1, "buy", candles[t + 1, 1] * 1.0005))
+            holding = True
+        elif position[t] == -1 and holding:
+            expected.append((t + 1, "sell", candles[t + 1, 1] * 0.9995))
+            holding = False
+    assert len(trades) == len(expected) > 2
+    cash = 0.0
+    for trade, (t, side, price) in zip(trades.itertuples(), expected):
+        assert trade.time.timestamp() == candles[t, 0] and trade.side == side
+        assert np.isclose(trade.price, price, rtol=1e-12)
+        cash += (-1 if side == "buy" else 1) * price * size - price * size * fee
+    held = size * candles[-1, 4] if holding else 0.0
+    assert np.isclose(equity.iloc[-1], cash + held, rtol=1e-12)
+    print(f"replay makes the {len(trades)} trades of the point in time signals")
+
+
+def test_replay_many():
+    candles = history(900)
+    with tempfile.TemporaryDirectory() as root:
+        CandleArchive.open("AUSD", '1', root).append(candles)
+        CandleArchive.open("BUSD", '1', root).append(history(900))
+        jobs = [{'pair': pair, 'interval': '1', 'size': 1.0, 'root': root, 'prominence': prominence, 'window': 300}
+                for pair in ("AUSD", "BUSD") for prominence in (1.0, 2.0)]
+        results = replay_many(jobs, workers=2)
+        assert list(results['pair']) == ["AUSD", "AUSD", "BUSD", "BUSD"]
+        for job, row in zip(jobs, results.itertuples()):
+            assert row.prominence == job['prominence']
+            assert np.isclose(row.pnl, replay_job(job)['pnl'])
+        trades, equity, _ = replay(candles, 1.0, prominence=1.0, window=300)
+        assert np.isclose(results['pnl'].iloc[0], equity.iloc[-1]) and results['trades'].iloc[0] == len(trades)
+    print(f"replay_many ran {len(jobs)} jobs")
+
+
+if __name__ == "__main__":
+    test_fill_price()
+    test_matches_signals()
+    test_replay_many()
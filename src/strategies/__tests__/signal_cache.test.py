@@ -0,0 +1,46 @@
+import numpy as np
+from src.data.candle_buffer import CandleBuffer
+from src.strategies.pv_wave import Wave_Strat
+from src.strategies.signal_cache import SignalCache, FIELDS
+
+rng = np.random.default_rng(19)
+
+
+def candle(t, price):
+    return [t * 300, price, price, price, price, price, 1, 1]
+
+
+def wave(candles, cache=None):
+    return Wave_Strat("SOLUSD", '5', signal_delay=1, prominence=1.2, distance=10, level=1, candles=candles, cache=cache)
+
+
+# polls that revise the forming candle, close it or change nothing give what an uncached Wave_Strat gives
+def test_matches_uncached():
+    cache = SignalCache(maxsize=4)
+    candles = CandleBuffer(300)
+    price = 100.0
+    for t in range(400):
+        candles.append(candle(t, price))
+    hits = 0
+    for t in range(400, 600):
+        # a few polls per candle: the forming candle moves, or nothing moved since the last poll
+        for _ in range(4):
+            if rng.random() < 0.5:
+                price += rng.normal()
+                candles.replace_last(candle(t - 1, price))
+            strategy = wave(candles, cache)
+            expected = wave(candles)
+            # the streaming denoise agrees with the batch one to rounding
+            assert np.allclose(strategy.denoised_close, expected.denoised_close, rtol=0, atol=1e-9), t
+            for field in FIELDS[1:]:
+                assert np.array_equal(getattr(strategy, field), getattr(expected, field)), (t, field)
+            assert strategy.get_last_signal() == expected.get_last_signal()
+            repeat = wave(candles, cache)
+            hits += repeat.denoised_close is strategy.denoised_close
+        candles.append(candle(t, price))
+    assert hits == 800
+    assert len(cache.entries) == 4
+    print("SignalCache matches Wave_Strat on every poll and repeats are served from the cache")
+
+
+test_matches_uncached()
@@ -0,0 +1,29 @@
+import numpy as np
+from src.data.candle_buffer import CandleBuffer
+from src.strategies.pv_wave import Wave_Strat
+from src.strategies.sweep import sweep
+
+rng = np.random.default_rng(11)
+
+
+# every row of the sweep is what a Wave_Strat with those parameters gives on the same candles
+def test_matches_wave_strat():
+    candles = CandleBuffer(720)
+    close = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=720)))
+    for i, price in enumerate(close):
+        candles.append([i * 300, price, price, price, price, price, 1, 1])
+    results = sweep(candles, signal_delay=(0, 1, 5), prominence=(0.5, 1.6, 3), distance=(5, 10), level=(1, 2), interval='5', workers=2)
+    assert len(results) == 3 * 3 * 2 * 2
+    for row in results.itertuples():
+        strategy = Wave_Strat("SOLUSD", '5', signal_delay=row.signal_delay, prominence=row.prominence, distance=row.distance, level=row.level, candles=candles)
+        assert np.isclose(row.total_return, strategy.cumulative_returns[-1] - 1, rtol=1e-9, atol=1e-12)
+        assert row.trades == np.count_nonzero(strategy.signals)
+        returns = strategy.strategy_returns[1:]
+        assert np.isclose(row.sharpe, returns.mean() / returns.std() * np.sqrt(365 * 24 * 12), equal_nan=True)
+        equity = np.concatenate([[1], strategy.cumulative_returns[1:]])
+        assert np.isclose(row.max_drawdown, (equity / np.maximum.accumulate(equity) - 1).min())
+    print(f"{len(results)} sweep results match Wave_Strat")
+
+
+if __name__ == "__main__":
+    test_matches_wave_strat()
@@ -0,0 +1,80 @@
+# one refresh of the convergence tape: every interval is derived from the same poll of the 1 minute feed, then
+# the intervals are evaluated concurrently and gathered into one snapshot, so the table shows one moment.
+# Each interval is pinned to its own worker so its denoiser, signal cache and MACD state stay warm between polls
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import numpy as np
+from src.data.candle_buffer import CandleBuffer, TIME
+from src.data.candle_store import MAX_CANDLES
+from src.data.resample import CandleResampler
+from src.strategies.macd import MACD
+from src.strategies.pv_wave import Wave_Strat
+from src.strategies.signal_cache import signal_cache
+
+# (asset, interval) -> CandleBuffer / MACD of the worker the interval is pinned to. Keyed by asset too so
+# thread pool tapes of several pairs in one process keep their own
+buffers = {}
+macds = {}
+
+
+def evaluate_interval(asset, interval, prominence, rows):
+    """
+    Wave_Strat and MACD of one interval on a snapshot of its (n, 8) candle rows, runs in the interval's worker
+    returns {"interval", "last_non_zero_position", "last_macd_signal", "current_close_price"}
+    """
+    key = (asset, interval)
+    if key not in buffers:
+        buffers[key] = CandleBuffer(max(len(rows), MAX_CANDLES))
+        macds[key] = MACD(asset, interval, candles=buffers[key])
+    buffer = buffers[key]
+    # the snapshot replaces the window like CandleStore.merge, the state only has to catch up on the newest candles
+    buffer.drop_from(rows[0, TIME])
+    buffer.extend(rows)
+    strategy = Wave_Strat(asset, interval, signal_delay=0, prominence=prominence, distance=10, level=1, candles=buffer, cache=signal_cache)
+    latest_signal = strategy.get_last_signal()
+    return {
+        "interval": interval,
+        "last_non_zero_position": latest_signal["last_non_zero_position"],
+        "last_macd_signal": macds[key].macdStrategy()["last_signal"],
+        "current_close_price": latest_signal["current_close_price"],
+    }
+
+
+class ConvergenceTape:
+    """
+    Wave_Strat and MACD signals of one pair on several intervals, all from one refresh of the 1 minute feed.
+    With processes=True every interval gets a one process pool of its own, so the pywt/scipy work of the
+    intervals runs in parallel and each keeps its state in one place. With processes=False they share a
+    thread pool in this process.
+    """
+    def __init__(self, asset, signal_map, processes=True, feed=None):
+        self.asset = asset
+        # interval -> prominence
+        self.signal_map = {str(interval): prominence for interval, prominence in signal_map.items()}
+        self.feed = feed or CandleResampler(asset, self.signal_map.keys())
+        if processes:
+            # spawned, not forked: the parent already runs the kraken transport thread by the first snapshot
+            context = multiprocessing.get_context("spawn")
+            self.pools = {interval: ProcessPoolExecutor(max_workers=1, mp_context=context) for interval in self.signal_map}
+        else:
+            pool = ThreadPoolExecutor(max_workers=len(self.signal_map))
+            self.pools = {interval: pool for interval in self.signal_map}
+
+    def snapshot(self):
+        """
+        Refresh the feed once and evaluate every interval on it
+        returns (time of the newest 1 minute candle, [result per interval in signal_map order])
+        """
+        self.feed.refresh()
+        time = self.feed.candles("1").last_time()
+        jobs = []
+        for interval, prominence in self.signal_map.items():
+            candles = self.feed.candles(interval)
+            # copy of the window as it is now, the feed's buffers change on the next refresh
+            rows = np.ascontiguousarray(candles.data[:, candles.start:candles.start + len(candles)].T)
+            jobs.append(self.pools[interval].submit(evaluate_interval, self.asset, interval, prominence, rows))
+        return time, [job.result() for job in jobs]
+
+    def close(self):
+        for pool in set(self.pools.values()):
+            pool.shutdown()
@@ -0,0 +1,203 @@
+# wavelet denoising of a sliding candle window that only recomputes the coefficients new or revised candles touch
+import numpy as np
+import pywt
+
+
+def wavelet_denoise(x, level, wavelet="db8", threshold=0.05):
+    # batch denoise of a whole window: wavedec, soft threshold every detail level at threshold * its max, waverec
+    coeffs = pywt.wavedec(x, wavelet, level=level)
+    coeffs[1:] = [pywt.threshold(i, value=threshold*i.max(), mode='soft') for i in coeffs[1:]]
+    # waverec gives back one extra sample for odd lengths
+    return pywt.waverec(coeffs, wavelet)[:len(x)]
+
+
+def soft_threshold(data, value):
+    # same arithmetic as pywt.threshold(data, value, mode='soft'), callers silence the divide by zero warnings
+    thresholded = 1 - value / np.absolute(data)
+    np.maximum(thresholded, 0, out=thresholded)
+    return data * thresholded
+
+
+def symmetric_index(index, size):
+    # pywt's 'symmetric' extension mirrors around the edges: x1 x0 | x0 x1 ... xn-1 | xn-1 xn-2
+    index = np.where(index < 0, -index - 1, index)
+    return np.where(index >= size, 2 * size - 1 - index, index)
+
+
+class StreamingDenoiser:
+    """
+    Same output as wavelet_denoise (wavedec, soft threshold at threshold * max(detail), waverec),
+    but the coefficients, thresholded coefficients and reconstruction of the previous window are kept and
+    only the ones whose support touches new, revised or edge samples are recomputed.
+
+    A dwt only lines up with an earlier one when the window moved by a multiple of 2**level samples,
+    so one state is kept per alignment (start % 2**level). Revising the forming candle touches the last
+    few coefficients of each level, a new candle also the first few once the window is full.
+    If a level's threshold moves (its largest detail coefficient changed) that level is rebuilt in full.
+    """
+    def __init__(self, wavelet="db8", level=1, threshold=0.05):
+        self.wavelet = pywt.Wavelet(wavelet)
+        self.level = level
+        self.threshold = threshold
+        self.width = self.wavelet.dec_len
+        # analysis filters reversed so a coefficient is a dot product with its samples in order
+        self.analysis = np.column_stack([self.wavelet.dec_lo[::-1], self.wavelet.dec_hi[::-1]])
+        self.rec_lo = np.array(self.wavelet.rec_lo)
+        self.rec_hi = np.array(self.wavelet.rec_hi)
+        # start % 2**level -> state of the last window with that alignment
+        self.states = {}
+        # the edge coefficients of a window size are always the same gathers and products, built once per size
+        self.windows = {}
+        self.synthesis = {}
+
+    def denoise(self, x, start):
+        """
+        Denoised copy of the window x, start is the absolute index of x[0] (e.g. candle time // interval seconds)
+        so windows can be matched up between calls. The returned array must not be modified.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        phase = start % (1 << self.level)
+        state = self.states.get(phase)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if state is not None:
+                state = self.update(state, x, start)
+            if state is None:
+                state = self.full(x, start)
+        self.states[phase] = state
+        return state["output"]
+
+    def full(self, x, start):
+        # plain batch transform, the coefficients of every level are kept for the next update
+        state = {"start": start, "x": x.copy(), "a": [], "d": [], "thresholds": [], "td": [], "rec": [None] * self.level}
+        approximation = x
+        for _ in range(self.level):
+            approximation, detail = pywt.dwt(approximation, self.wavelet)
+            threshold = self.threshold * detail.max()
+            state["a"].append(approximation)
+            state["d"].append(detail)
+            state["thresholds"].append(threshold)
+            state["td"].append(soft_threshold(detail, threshold))
+        reconstruction = approximation
+        for j in reversed(range(self.level)):
+            # waverec drops the extra approximation sample of odd lengths
+            reconstruction = reconstruction[:len(state["td"][j])]
+            reconstruction = pywt.idwt(reconstruction, state["td"][j], self.wavelet)
+            state["rec"][j] = reconstruction
+        state["output"] = reconstruction[:len(x)]
+        return state
+
+    def analyze(self, samples, first, last):
+        """
+        Approximation and detail coefficients [first, last) of one dwt level, edges mirrored like pywt
+        """
+        key = (len(samples), first, last)
+        if key not in self.windows:
+            k = np.arange(first, last)
+            self.windows[key] = symmetric_index((2 * k + 2 - self.width)[:, None] + np.arange(self.width), len(samples))
+        coefficients = samples[self.windows[key]] @ self.analysis
+        return coefficients[:, 0], coefficients[:, 1]
+
+    def synthesize(self, approximation, detail, first, last):
+        """
+        Reconstructed samples [first, last) of one idwt level, sample m = sum over k of
+        rec_lo[m + width - 2 - 2k] * approximation[k] + rec_hi[m + width - 2 - 2k] * detail[k]
+        """
+        key = (len(detail), first, last)
+        if key not in self.synthesis:
+            low = max(0, (first - 1) // 2)
+            high = min(len(detail), (last + self.width - 2) // 2 + 1)
+            taps = np.arange(first, last)[:, None] + self.width - 2 - 2 * np.arange(low, high)
+            valid = (taps >= 0) & (taps < self.width)
+            taps = np.where(valid, taps, 0)
+            matrix = np.hstack([np.where(valid, self.rec_lo[taps], 0), np.where(valid, self.rec_hi[taps], 0)])
+            self.synthesis[key] = (low, high, matrix)
+        low, high, matrix = self.synthesis[key]
+        return matrix @ np.concatenate([approximation[low:high], detail[low:high]])
+
+    def update(self, state, x, start):
+        """
+        Next state from the previous window with the same alignment, or None if it can't be reused
+        """
+        shift = start - state["start"]
+        old = state["x"]
+        overlap = len(old) - shift
+        # the new window has to start at or after the old one and reach at least as far
+        if shift < 0 or overlap <= 0 or overlap > len(x) or len(x) < self.width << self.level:
+            return None
+        same = old[shift:] == x[:overlap]
+        # samples from `dirty` on are new or revised, == len(x) when nothing changed up to the old end
+        dirty = overlap if same.all() else int(np.argmin(same))
+        if shift == 0 and dirty == len(x):
+            return state
+        moved = shift > 0
+        width = self.width
+
+        new = {"start": start, "x": x.copy(), "a": [], "d": [], "thresholds": [], "td": [], "rec": [None] * self.level}
+        # (head, tail) per level: coefficients before head and from tail on were recomputed
+        ranges = []
+        samples = x
+        head, tail = 0, dirty
+        for j in range(self.level):
+            offset = shift >> (j + 1)
+            size = (len(samples) + width - 1) // 2
+            # coefficients that only read clean samples, the mirrored head is clean only if the window didn't move
+            first = -(-(width - 2 + head) // 2) if moved else 0
+            last = size if tail == len(samples) else tail // 2
+            last = min(last, len(state["a"][j]) - offset)
+            first = min(first, last)
+            approximation = np.empty(size)
+            detail = np.empty(size)
+            approximation[first:last] = state["a"][j][first + offset:last + offset]
+            detail[first:last] = state["d"][j][first + offset:last + offset]
+            if first:
+                approximation[:first], detail[:first] = self.analyze(samples, 0, first)
+            if last < size:
+                approximation[last:], detail[last:] = self.analyze(samples, last, size)
+
+            threshold = self.threshold * detail.max()
+            if threshold == state["thresholds"][j]:
+                thresholded = np.empty(size)
+                thresholded[first:last] = state["td"][j][first + offset:last + offset]
+                if first:
+                    thresholded[:first] = soft_threshold(detail[:first], threshold)
+                if last < size:
+                    thresholded[last:] = soft_threshold(detail[last:], threshold)
+                detail_range = (first, last)
+            else:
+                thresholded = soft_threshold(detail, threshold)
+                detail_range = (size, 0)
+            new["a"].append(approximation)
+            new["d"].append(detail)
+            new["thresholds"].append(threshold)
+            new["td"].append(thresholded)
+            ranges.append(detail_range)
+            samples, head, tail = approximation, first, last
+
+        reconstruction = samples
+        for j in reversed(range(self.level)):
+            thresholded = new["td"][j]
+            size = len(thresholded)
+            if len(reconstruction) == size + 1:
+                reconstruction = reconstruction[:size]
+                tail = min(tail, size)
+            head = max(head, ranges[j][0])
+            tail = min(tail, ranges[j][1])
+            offset = shift >> j
+            length = 2 * size - width + 2
+            first = 2 * head
+            last = length if tail == size else 2 * tail - width + 2
+            last = min(last, len(state["rec"][j]) - offset)
+            if last <= first:
+                output = pywt.idwt(reconstruction, thresholded, self.wavelet)
+                first, last = length, length
+            else:
+                output = np.empty(length)
+                output[first:last] = state["rec"][j][first + offset:last + offset]
+                if first:
+                    output[:first] = self.synthesize(reconstruction, thresholded, 0, first)
+                if last < length:
+                    output[last:] = self.synthesize(reconstruction, thresholded, last, length)
+            new["rec"][j] = output
+            reconstruction, head, tail = output, first, last
+        new["output"] = reconstruction[:len(x)]
+        return new
@@ -1,55 +1,46 @@
 # based off of R%D/ema.ipynb file I've found in the repository.
 import pandas as pd
 import numpy as np
-import requests
+import time
+from src.data.candle_store import candle_store
+from src.strategies.indicators import StreamingEMA, CandleTracker
 
 # lets create a class for the EMA strategy
 class EMA:
-    def __init__(self, pair, interval):
+    def __init__(self, pair, interval, candles=None):
         self.pair = pair
         self.interval = interval
+        # CandleBuffer to run on, if None the shared candle store's buffer is used
+        self.candles = candles
+        self.from_store = candles is None
+        # span -> CandleTracker, kept between polls so each poll only adds the candles that closed since
+        self.trackers = {}
         
+    # candles come from the shared store so only new candles are downloaded on each poll
     def get_ohlc_data(self):
-        url = "https://api.kraken.com/0/public/OHLC"
-        querystring = {
-            "pair": self.pair,
-            "interval": self.interval
-        }
-        response = requests.request("GET", url, params=querystring)
-        data = response.json()
-        return data
+        if self.from_store:
+            self.candles = candle_store.candles(self.pair, self.interval)
+        return self.candles
 
-    # calculate the EMA strategy
-    def emaStrategy(self, short_period, long_period):
-        # get the data
-        data = self.get_ohlc_data()
-        df = pd.DataFrame(data['result'][self.pair])
-        df.columns = ['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count']
-        # all values from the api are strings besides time and count so we need to convert them to float
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['close'] = df['close'].astype(float)
-        df['vwap'] = df['vwap'].astype(float)
-        df['volume'] = df['volume'].astype(float)
+    def ema(self, candles, period):
+        # (ema up to the last closed candle, ema with the forming candle)
+        if period not in self.trackers:
+            self.trackers[period] = CandleTracker(lambda: StreamingEMA(period))
+        return self.trackers[period].update(candles)
 
-        # order by time 
-        df = df.sort_values(by='time', ascending=True)
-        # convert time to datetime and set it as index
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        df.set_index('time', inplace=True)
-        # add back time to the dataframe
-        df['time'] = df.index
-        # make human readable time
-        df['nice-time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    # calculate the EMA strategy, keep the EMA object between polls so the averages are updated instead of recomputed
+    def emaStrategy(self, short_period, long_period):
+        # get the data, candles are already float and ordered by time
+        candles = self.get_ohlc_data()
     
-        # calculate the EMA strategy
-        df['short_ema'] = df['close'].ewm(span=short_period).mean()
-        df['long_ema'] = df['close'].ewm(span=long_period).mean()
+        # calculate the EMA strategy on the newest candle and the one before it
+        previous_short, short_ema = self.ema(candles, short_period)
+        previous_long, long_ema = self.ema(candles, long_period)
         # print latest short and long period
       
-        df['position'] = np.where(df['short_ema'] > df['long_ema'], 1, 0)
-        print(short_period, long_period, df['short_ema'].iloc[1], df['long_ema'].iloc[1])
+        position = 1 if short_ema > long_ema else 0
+        previous_position = 1 if previous_short > previous_long else 0
+        print(short_period, long_period, short_ema, long_ema)
     
         # format json to the following:
         # include position long/short
@@ -59,13 +50,12 @@ class EMA:
         # long_period
         # execute order True/False meaning buy/sell if position switches from 0 to 1 or 1 to 0 from last candle to current candle
         return {
-            'position': df['position'].iloc[0],
+            'position': position,
             'pair': self.pair,
-            'time': df['time'].iloc[0],
-            'nice-time': df['nice-time'].iloc[0],
-            'short_ema': df['short_ema'].iloc[0],
-            'long_ema': df['long_ema'].iloc[0],
+            'time': pd.to_datetime(candles.time[-1], unit='s'),
+            'nice-time': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(candles.time[-1])),
+            'short_ema': short_ema,
+            'long_ema': long_ema,
             # if the position changes from 0 to 1 or 1 to 0 then execute the order, if 3 are the same then don't execute the order
-            'execute_order': df['position'].iloc[0] != df['position'].iloc[1] 
+            'execute_order': position != previous_position
         } 
-
@@ -0,0 +1,182 @@
+# backtest the EMA crossover of ema.py for every (short span, long span) pair at once
+# the EMAs of all spans are one (spans x time) matrix. Each short span is compared against a block of long spans
+# in one broadcast to find the crossings, everything after that only looks at the crossings: the return and
+# drawdown of a stretch of holding come from range lookups on the cumulative log return, shared by every pair
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from src.data.candle_buffer import CandleBuffer, CLOSE
+
+# same fee the account summary takes off a sale
+FEE = 0.004
+# largest (long spans x candles) block compared at once
+MAX_BLOCK = 1 << 23
+
+
+def ema_matrix(close, spans, adjust=True):
+    """
+    (len(spans), n) matrix, row i is pandas ewm(span=spans[i], adjust=adjust).mean() of close
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    emas = np.empty((len(spans), n))
+    for i, span in enumerate(spans):
+        alpha = 2 / (span + 1)
+        decay = 1 - alpha
+        if adjust:
+            # decayed sum of the closes over the decayed sum of the weights
+            num = lfilter([1.0], [1.0, -decay], close)
+            den = lfilter([1.0], [1.0, -decay], np.ones(n))
+            emas[i] = num / den
+        else:
+            # starts from the first close
+            emas[i] = lfilter([alpha], [1.0, -decay], close, zi=[decay * close[0]])[0]
+    return emas
+
+
+class RangeStats:
+    """
+    Max, min and largest drop (max of x[u] - x[v] over u <= v) of any range x[first..last] in O(1).
+    Disjoint sparse table: on level k the series is cut in blocks of 2**(k+1), the left half of each block
+    stores the stats from every sample up to the middle, the right half from the middle on. A range whose ends
+    first differ in bit k spans exactly one middle on level k, so it is the left entry joined with the right one.
+    """
+    def __init__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        self.x = x
+        n = len(x)
+        levels = max(1, int(n - 1).bit_length())
+        size = 1 << levels
+        padded = np.empty(size)
+        padded[:n] = x
+        padded[n:] = x[-1] if n else 0
+        # (high, low, drop) of every level next to each other per sample, the ranges are looked up in time order
+        # so neighbouring lookups read neighbouring memory
+        self.table = np.empty((n, levels, 3))
+        level = np.empty((size, 3))
+        for k in range(levels):
+            half = 1 << k
+            blocks = padded.reshape(-1, 2, half)
+            table = level.reshape(-1, 2, half, 3)
+            # left halves, accumulated from the middle outwards (reversed)
+            left = blocks[:, 0, ::-1]
+            low = np.minimum.accumulate(left, axis=1)
+            table[:, 0, :, 0] = np.maximum.accumulate(left, axis=1)[:, ::-1]
+            table[:, 0, :, 1] = low[:, ::-1]
+            # a sample's drop to anything between it and the middle
+            table[:, 0, :, 2] = np.maximum.accumulate(left - low, axis=1)[:, ::-1]
+            # right halves, accumulated from the middle on
+            right = blocks[:, 1]
+            high = np.maximum.accumulate(right, axis=1)
+            table[:, 1, :, 0] = high
+            table[:, 1, :, 1] = np.minimum.accumulate(right, axis=1)
+            table[:, 1, :, 2] = np.maximum.accumulate(high - right, axis=1)
+            self.table[:, k] = level[:n]
+
+    def query(self, first, last):
+        """
+        (high, low, drop) arrays for the ranges x[first[i]..last[i]], first <= last
+        """
+        first = np.asarray(first, dtype=np.int64)
+        last = np.asarray(last, dtype=np.int64)
+        single = first == last
+        # highest bit where the ends differ
+        level = np.frexp((first ^ last).astype(np.float64))[1] - 1
+        level[single] = 0
+        levels = self.table.shape[1]
+        rows = self.table.reshape(-1, 3)
+        left = np.take(rows, first * levels + level, axis=0)
+        right = np.take(rows, last * levels + level, axis=0)
+        high = np.maximum(left[:, 0], right[:, 0])
+        low = np.minimum(left[:, 1], right[:, 1])
+        drop = np.maximum(np.maximum(left[:, 2], right[:, 2]), left[:, 0] - right[:, 1])
+        high[single] = self.x[first[single]]
+        low[single] = self.x[first[single]]
+        drop[single] = 0
+        return high, low, drop
+
+
+def crossover_backtest(candles, spans=range(1, 101), fee=FEE, lag=1, adjust=True):
+    """
+    Long while the short EMA is above the long EMA, flat otherwise (ema.py's position), for every pair of spans
+    with short < long. The position decided at the close of candle t is only traded `lag` candles later and
+    every change of position pays `fee` of its value.
+    candles is a CandleBuffer, (n, 8) candle rows or a close array.
+    returns {"total_return", "max_drawdown", "trades"}: DataFrames indexed by short span with a column per
+    long span, NaN where short >= long
+    """
+    if isinstance(candles, CandleBuffer):
+        close = np.array(candles.close)
+    else:
+        close = np.asarray(candles, dtype=np.float64)
+        close = close[:, CLOSE] if close.ndim == 2 else close
+    spans = sorted(spans)
+    emas = ema_matrix(close, spans, adjust)
+    n = len(close)
+    cost = np.log1p(-fee)
+    # log equity of always being long, a stretch of holding earns the difference between its ends
+    growth = np.zeros(n)
+    growth[1:] = np.cumsum(np.log(close[1:] / close[:-1]))
+    stats = RangeStats(growth)
+
+    total_return = np.full((len(spans), len(spans)), np.nan)
+    max_drawdown = np.full((len(spans), len(spans)), np.nan)
+    trades = np.full((len(spans), len(spans)), np.nan)
+    step = max(1, MAX_BLOCK // max(1, n))
+    for i, short in enumerate(spans):
+        # spans are sorted, so the long spans of a short one are the rows after it
+        longs = range(int(np.searchsorted(spans, short, side='right')), len(spans))
+        for first in range(longs.start, longs.stop, step):
+            block = range(first, min(first + step, longs.stop))
+            # signal of every long span in the block with a flat column in front, so the first candle can flip too
+            above = np.zeros((len(block), n + 1), dtype=bool)
+            np.greater(emas[i], emas[block.start:block.stop], out=above[:, 1:])
+            # the signal flips up (buy) or down (sell) at these candles and is traded `lag` later, the position
+            # then changes over the next candle so the last candle can't trade anymore.
+            # flatnonzero on the flat mask is much faster than a 2-D nonzero
+            buy_rows, buy_times = np.divmod(np.flatnonzero(above[:, 1:] > above[:, :-1]), n)
+            sell_rows, sell_times = np.divmod(np.flatnonzero(above[:, 1:] < above[:, :-1]), n)
+            buy_times += lag
+            sell_times += lag
+            valid = buy_times <= n - 2
+            buy_rows, buy_times = buy_rows[valid], buy_times[valid]
+            valid = sell_times <= n - 2
+            sell_rows, sell_times = sell_rows[valid], sell_times[valid]
+            buys = np.bincount(buy_rows, minlength=len(block))
+            sells = np.bincount(sell_rows, minlength=len(block))
+            trades[i, block.start:block.stop] = buys + sells
+            # buys and sells alternate in every row starting with a buy, so the k-th buy of a row is closed by the
+            # k-th sell of the row if there is one. Rows that end holding have one sell less than buys
+            bounds = np.concatenate([[0], np.cumsum(buys)])
+            still_open = np.concatenate([[0], np.cumsum(buys - sells)])
+            position = np.arange(len(buy_rows))
+            sold = position - bounds[buy_rows] < sells[buy_rows]
+            # the ones still open at the end point at n
+            sell_times = np.append(sell_times, n)[np.where(sold, position - still_open[buy_rows], len(sell_times))]
+            # held over the candles after the buy up to and including the sell candle (or the end).
+            # Until the sell fee the equity follows growth from the buy on: offset + growth[t]
+            high, low, drop = stats.query(buy_times, np.where(sold, sell_times - 1, n - 1))
+            # log equity change from before the buy to after the sell (or the end), both fees included
+            change = np.where(sold, growth[np.minimum(sell_times, n - 1)] + cost, growth[n - 1]) - growth[buy_times] + cost
+            # log equity before each buy, the sum of the changes of the earlier holdings in the row
+            earlier = np.cumsum(change) - change
+            before = earlier - earlier[bounds[buy_rows]]
+            offset = before + cost - growth[buy_times]
+            top = offset + high
+            after = before + change
+            # the sell fee lands on the sell candle, after the looked up range
+            bottom = np.where(sold, np.minimum(offset + low, after), offset + low)
+            fall = np.where(sold, np.maximum(drop, top - after), drop)
+            highest = np.maximum(top, after)
+            for row, j in enumerate(block):
+                start, stop = bounds[row], bounds[row + 1]
+                if start == stop:
+                    total_return[i, j] = 0.0
+                    max_drawdown[i, j] = 0.0
+                    continue
+                # highest equity before each holding, starting from 0
+                peak = np.maximum.accumulate(np.concatenate([[0], highest[start:stop - 1]]))
+                total_return[i, j] = np.expm1(after[stop - 1])
+                max_drawdown[i, j] = np.expm1(-max(0.0, fall[start:stop].max(), (peak - bottom[start:stop]).max()))
+    frame = lambda values: pd.DataFrame(values, index=pd.Index(spans, name='short'), columns=pd.Index(spans, name='long'))
+    return {"total_return": frame(total_return), "max_drawdown": frame(max_drawdown), "trades": frame(trades)}
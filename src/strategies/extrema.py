@@ -0,0 +1,81 @@
+# peaks/valleys of one series for many (prominence, distance) thresholds, same peaks as
+# scipy.signal.find_peaks(x, prominence=, distance=) for each of them
+import math
+import numpy as np
+from scipy.signal import find_peaks, peak_prominences
+
+
+def select_by_distance(index, height, distance):
+    """
+    Mask of the candidates find_peaks(x, distance=distance) keeps: from the highest candidate down, every candidate
+    closer than distance to a kept one is dropped. Ranked with the same np.argsort as find_peaks so exact ties
+    come out the same way
+    """
+    distance = math.ceil(distance)
+    keep = np.ones(len(index), dtype=bool)
+    # the candidates within distance of each one are a contiguous run around it
+    lows = np.searchsorted(index, index - distance, side='right').tolist()
+    highs = np.searchsorted(index, index + distance, side='left').tolist()
+    for j in np.argsort(height)[::-1].tolist():
+        if keep[j]:
+            keep[lows[j]:j] = False
+            keep[j + 1:highs[j]] = False
+    return keep
+
+
+class Extrema:
+    """
+    Every local maximum of a series with its prominence, found once. The peaks
+    find_peaks(x, prominence=prominence, distance=distance) gives for any thresholds are then a filter
+    over these candidates: distance is decided from the candidates alone and cached per distance,
+    prominence is a comparison.
+    """
+    def __init__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        self.index, _ = find_peaks(x)
+        self.height = x[self.index]
+        self.prominence = peak_prominences(x, self.index)[0]
+        # distance -> mask of the candidates that pass it
+        self.spaced = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def keep(self, distance):
+        if distance is not None and distance < 1:
+            raise ValueError('`distance` must be greater or equal to 1')
+        if distance is None or distance == 1 or not len(self.index):
+            return np.ones(len(self.index), dtype=bool)
+        if distance not in self.spaced:
+            self.spaced[distance] = select_by_distance(self.index, self.height, distance)
+        return self.spaced[distance]
+
+    def select(self, prominence=None, distance=None):
+        # same as find_peaks(x, prominence=prominence, distance=distance)[0]
+        keep = self.keep(distance)
+        if prominence is not None:
+            keep = keep & (self.prominence >= prominence)
+        return self.index[keep]
+
+
+class ExtremaTable:
+    """
+    Peaks and valleys of one series for many (prominence, distance) thresholds, e.g. a sweep over
+    Wave_Strat parameters: two prominence passes in total instead of two find_peaks calls per threshold.
+    """
+    def __init__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        self.peaks = Extrema(x)
+        self.valleys = Extrema(-x)
+
+    def select(self, prominence=None, distance=None):
+        """
+        (peaks, valleys) index arrays for one threshold
+        """
+        return self.peaks.select(prominence, distance), self.valleys.select(prominence, distance)
+
+    def sweep(self, thresholds):
+        """
+        {(prominence, distance): (peaks, valleys)} for every threshold pair
+        """
+        return {(prominence, distance): self.select(prominence, distance) for prominence, distance in thresholds}
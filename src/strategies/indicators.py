@@ -0,0 +1,96 @@
+# stateful EMA/MACD calculators that update from the newest close instead of re-running ewm over the whole window
+import numpy as np
+
+
+class StreamingEMA:
+    """
+    Exponential moving average matching pandas ewm(span=span, adjust=adjust).mean(), one close at a time.
+    push() adds a closed candle to the state, peek() gives the value with a still forming candle on top
+    without keeping it, so the forming candle can be revised any number of times before it closes.
+    """
+    def __init__(self, span, adjust=True):
+        self.alpha = 2 / (span + 1)
+        self.adjust = adjust
+        # value = num / den, with adjust=True both are the decayed sums pandas divides, otherwise den is 1
+        self.num = 0.0
+        self.den = 0.0
+        self.value = np.nan
+
+    def step(self, close):
+        decay = 1 - self.alpha
+        if self.adjust:
+            return decay * self.num + close, decay * self.den + 1
+        if self.den == 0:
+            # adjust=False starts from the first value
+            return close, 1.0
+        return decay * self.num + self.alpha * close, 1.0
+
+    def push(self, close):
+        self.num, self.den = self.step(close)
+        self.value = self.num / self.den
+        return self.value
+
+    def peek(self, close):
+        num, den = self.step(close)
+        return num / den
+
+
+class StreamingMACD:
+    """
+    MACD line, signal line and histogram, same as the ewm(adjust=False) version in macd.py
+    """
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast, adjust=False)
+        self.slow = StreamingEMA(slow, adjust=False)
+        self.signal = StreamingEMA(signal, adjust=False)
+        self.value = (np.nan, np.nan, np.nan)
+
+    def push(self, close):
+        macd = self.fast.push(close) - self.slow.push(close)
+        signal = self.signal.push(macd)
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+    def peek(self, close):
+        macd = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.peek(macd)
+        return macd, signal, macd - signal
+
+
+class CandleTracker:
+    """
+    Keeps a streaming indicator in step with a live CandleBuffer between polls.
+    Every candle but the newest is closed and pushed exactly once, the newest is still forming and only peeked.
+    The state covers all candles seen since the last reset rather than just the buffer's window, for the spans
+    used here the candles that fell out of a 720 candle window weigh less than float precision in ewm anyway.
+    """
+    def __init__(self, make):
+        # make() -> a fresh indicator with push/peek, e.g. lambda: StreamingEMA(12)
+        self.make = make
+        self.indicator = None
+        # time of the newest candle pushed into the indicator
+        self.last_time = None
+
+    def update(self, candles):
+        """
+        Push the candles that closed since the last update and return (closed value, value with the forming candle)
+        """
+        times = candles.time
+        close = candles.close
+        start = 0
+        if self.last_time is not None:
+            start = int(np.searchsorted(times, self.last_time))
+            if start == len(times) or times[start] != self.last_time:
+                # the last pushed candle is gone (window slid past it or history was replaced), start over
+                self.last_time = None
+                start = 0
+            else:
+                start += 1
+        if self.last_time is None:
+            # nothing pushed yet
+            self.indicator = self.make()
+        for i in range(start, len(times) - 1):
+            self.indicator.push(close[i])
+            self.last_time = times[i]
+        forming = self.indicator.peek(close[-1]) if len(times) else self.indicator.value
+        return self.indicator.value, forming
@@ -1,59 +1,36 @@
 # cacl macd strategy output and return the result
-import pandas as pd
-import numpy as np
-import requests
+from src.data.candle_store import candle_store
+from src.strategies.indicators import StreamingMACD, CandleTracker
 
 # get the max candles from the Kraken API
 # make this macd a class so getting data and calculating the strategy can be done in one call
 class MACD:
-    def __init__(self, pair, interval):
+    def __init__(self, pair, interval, candles=None):
         self.pair = pair
         self.interval = interval
-        self.df = None
+        # CandleBuffer to run on, if None the shared candle store's buffer is used
+        self.candles = candles
+        self.from_store = candles is None
+        # keep the MACD object between polls, only the candles that closed since the last poll are added
+        self.tracker = CandleTracker(StreamingMACD)
         
     def get_ohlc_data(self):
-        url = "https://api.kraken.com/0/public/OHLC"
-        querystring = {
-            "pair": self.pair,
-            "interval": self.interval
-        }
-        response = requests.request("GET", url, params=querystring)
-
-        # parse the json response and create a dataframe
-        data = response.json()
-        df = pd.DataFrame(data['result']["SOLUSD"], columns=['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
-
-        #besides time and count are strings so we need to convert them to floats
-        df['close'] = df['close'].astype(float)
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['vwap'] = df['vwap'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        df['count'] = df['count'].astype(float)
-        # create returns column
-        df['returns'] = df['close'].pct_change()
-
-        # assign to self.df
-        self.df = df
+        # get the candles from the shared store
+        if self.from_store:
+            self.candles = candle_store.candles(self.pair, self.interval)
+        return self.candles
 
     # calculate the MACD strategy
     def macdStrategy(self):
         # get the data
-        self.get_ohlc_data()
-        df = self.df
+        candles = self.get_ohlc_data()
 
-    
-        # calculate the MACD strategy
-        df['12ema'] = df['close'].ewm(span=12, adjust=False).mean()
-        df['26ema'] = df['close'].ewm(span=26, adjust=False).mean()
-        df['macd'] = df['12ema'] - df['26ema']
-        df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-        df['hist'] = df['macd'] - df['signal']
+        # macd, signal and histogram with the forming candle on top
+        _, (macd, signal, histogram) = self.tracker.update(candles)
 
-        df['position'] = np.where(df['macd'] > df['signal'], 1, 0)
+        position = 1 if macd > signal else 0
 
         # retturn the most recent signal by date
         return {
-            "last_signal":  df['position'].iloc[-1]
+            "last_signal":  position
         }
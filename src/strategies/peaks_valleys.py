@@ -3,7 +3,7 @@ import numpy as np
 import pywt
 from scipy.signal import find_peaks
 import matplotlib.pyplot as plt
-import requests
+from src.data.candle_store import candle_store
 
 class Wave_Strategy:
     def __init__(self, asset, interval, level, prominence=1, distance=10, price_col='close', time_col='time', volume_col='volume'):
@@ -18,26 +18,8 @@ class Wave_Strategy:
         self.df = None
 
     def load_data(self):
-        # get data for the last 720 candles from kraken api
-        url = "https://api.kraken.com/0/public/OHLC"
-        querystring = {"pair": self.asset,"interval": self.interval}
-        headers = {
-        'Accept': 'application/json'
-        }
-        response = requests.request("GET", url, params=querystring)
-
-        # parse the json response and create a dataframe
-        data = response.json()
-        df = pd.DataFrame(data['result'][self.asset], columns=['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
-
-        #besides time and count are strings so we need to convert them to floats
-        df['close'] = df['close'].astype(float)
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['vwap'] = df['vwap'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        df['count'] = df['count'].astype(float)
+        # get the last 720 candles from the shared store, only new candles are downloaded after the first call
+        df = candle_store.candles(self.asset, self.interval).to_frame()
         # create returns column
         df['returns'] = df['close'].pct_change()
         
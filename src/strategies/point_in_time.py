@@ -0,0 +1,53 @@
+# Wave_Strat signals as the live bot would have seen them: for every historical candle, what get_last_signal
+# returned from only the candles up to it, and the returns of trading on those signals like run_wave does.
+# consecutive windows share their work: the wavelet coefficients are updated instead of recomputed
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+from src.data.candle_buffer import CandleBuffer, TIME, CLOSE
+from src.strategies.denoise import StreamingDenoiser
+from src.strategies.pv_wave import last_signal
+
+SIGNAL_COLUMNS = ['last_signal', 'last_non_zero_position', 'periods_since_last_signal', 'last_non_zero_close_price', 'current_close_price']
+
+
+def point_in_time_signals(candles, signal_delay=0, prominence=1.1, distance=10, level=1, window=720, warmup=720):
+    """
+    Replay Wave_Strat over a history, candles are (n, 8) rows oldest first or a CandleBuffer.
+    At every candle the strategy sees the last `window` candles up to and including it (720 like the candle
+    store), or every candle so far if window is None. The first `warmup` candles get no signal.
+    returns a DataFrame indexed by candle time with the get_last_signal fields of every candle, the position
+    run_wave would hold after it (1 after a buy signal, 0 after a sell) and the returns of holding it
+    """
+    if isinstance(candles, CandleBuffer):
+        times, close = np.array(candles.time), np.array(candles.close)
+    else:
+        candles = np.asarray(candles, dtype=np.float64)
+        times, close = candles[:, TIME], candles[:, CLOSE]
+    n = len(close)
+    denoiser = StreamingDenoiser(level=level)
+    signals = {column: np.full(n, np.nan) for column in SIGNAL_COLUMNS}
+    for t in range(min(warmup, n), n):
+        start = 0 if window is None else max(0, t + 1 - window)
+        # zero copy view of the window, the denoiser matches it up with the previous one by its start
+        view = close[start:t + 1]
+        denoised = denoiser.denoise(view, start)
+        peaks = find_peaks(denoised, prominence=prominence, distance=distance)[0]
+        valleys = find_peaks(-denoised, prominence=prominence, distance=distance)[0]
+        signal = last_signal(peaks, valleys, view, signal_delay)
+        for column in SIGNAL_COLUMNS:
+            if signal[column] is not None:
+                signals[column][t] = signal[column]
+
+    df = pd.DataFrame(signals, index=pd.to_datetime(times, unit='s'))
+    df.index.name = 'time'
+    # run_wave buys on a buy signal and sells everything on a sell signal, the position is taken at the close
+    df['position'] = (df['last_non_zero_position'] == 1).astype(float)
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1
+    df['returns'] = returns
+    strategy_returns = np.zeros(n)
+    strategy_returns[1:] = df['position'].values[:-1] * returns[1:]
+    df['strategy_returns'] = strategy_returns
+    df['cumulative_returns'] = (1 + strategy_returns).cumprod()
+    return df
@@ -1,27 +1,86 @@
 import pandas as pd
 import numpy as np
-import pywt
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
-import requests
+from src.data.candle_store import candle_store
+from src.strategies.denoise import wavelet_denoise
+
+def last_signal(peaks, valleys, close, signal_delay=0):
+    """
+    Wave_Strat.get_last_signal from sorted peak/valley indices of the window, without building the signals array.
+    The signal of a peak/valley at index i shows up at i + signal_delay, so the newest one that already showed up
+    is the last peak/valley at or before n - 1 - signal_delay
+    """
+    last = len(close) - 1 - signal_delay
+    peak = np.searchsorted(peaks, last, side='right') - 1
+    valley = np.searchsorted(valleys, last, side='right') - 1
+    peak = peaks[peak] if peak >= 0 else -1
+    valley = valleys[valley] if valley >= 0 else -1
+
+    signal_type = None
+    periods_since_last_signal = None
+    last_non_zero_close_price = None
+    signal = 0.0
+    if max(peak, valley) >= 0:
+        signal_type = 1 if valley > peak else -1
+        last_non_zero_index = max(peak, valley) + signal_delay
+        periods_since_last_signal = len(close) - 1 - last_non_zero_index
+        last_non_zero_close_price = close[last_non_zero_index]
+        if periods_since_last_signal == 0:
+            signal = float(signal_type)
+
+    return {
+        "last_signal": signal,
+        "last_non_zero_position": signal_type,
+        "periods_since_last_signal": periods_since_last_signal,
+        "last_non_zero_close_price": last_non_zero_close_price,
+        "current_close_price": close[-1]
+    }
+
+
+def wave_order(last_non_zero_position, is_balance):
+    """
+    run_wave's rule, the replay backtester trades on it too: buy when the last signal is a buy and nothing is held,
+    sell when it is a sell and the base asset is held. returns "buy", "sell" or None (hold)
+    """
+    if last_non_zero_position == 1 and not is_balance:
+        return "buy"
+    if last_non_zero_position == -1 and is_balance:
+        return "sell"
+    return None
+
 
 class Wave_Strat:
-    def __init__(self, pair, interval, signal_delay, prominence, distance, level):
-        self.df = None
+    def __init__(self, pair, interval, signal_delay, prominence, distance, level, candles=None, denoiser=None, cache=None):
         self.pair = pair
         self.interval = interval
         self.signal_delay = signal_delay
         self.prominence = prominence
         self.distance = distance
         self.level = level
+        # CandleBuffer to run on, if None the shared candle store's buffer is used
+        self.candles = candles
+        # StreamingDenoiser kept by the caller between polls, if None the whole window is transformed every time
+        self.denoiser = denoiser
+        # SignalCache shared between polls and callers, if set an unchanged window is not computed again
+        self.cache = cache
+        self.close = None
         self.denoised_close = None
         self.peaks = None
         self.valleys = None
         self.signals = None
         self.positions = None
         self.returns = None
+        self.strategy_returns = None
+        self.cumulative_returns = None
         
         self.load_data()
+        if self.cache is not None:
+            self.cache.apply(self)
+        else:
+            self.compute()
+
+    def compute(self):
         self.denoise_close()
         self.find_peaks_valleys()
         self.generate_signals()
@@ -29,39 +88,23 @@ class Wave_Strat:
 
     # load the data via a def
     def load_data(self):
-        # get data for the last 720 candles from kraken api
-        url = "https://api.kraken.com/0/public/OHLC"
-        querystring = {"pair": self.pair,"interval": self.interval}
-        headers = {
-        'Accept': 'application/json'
-        }
-        response = requests.request("GET", url, params=querystring)
-
-        # parse the json response and create a dataframe
-        data = response.json()
-        df = pd.DataFrame(data['result'][self.pair], columns=['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
-
-        #besides time and count are strings so we need to convert them to floats
-        df['close'] = df['close'].astype(float)
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['vwap'] = df['vwap'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        df['count'] = df['count'].astype(float)
-        # create returns column
-        df['returns'] = df['close'].pct_change()
-
-        # assign the dataframe to the class variable
-        self.df = df
+        # get the last 720 candles from the shared store, only new candles are downloaded after the first call
+        if self.candles is None:
+            self.candles = candle_store.candles(self.pair, self.interval)
+        # zero copy view of the close column
+        self.close = self.candles.close
+
+    def start(self):
+        # absolute index of the first candle in the window, candles are numbered by their open time
+        return int(self.candles.time[0] // (int(self.interval) * 60))
 
     def denoise_close(self):
+        if self.denoiser is not None:
+            # only the coefficients touched by new or revised candles are recomputed
+            self.denoised_close = self.denoiser.denoise(self.close, self.start())
+            return
         # Wavelet denoising
-        close = self.df['close'].values
-        coeffs = pywt.wavedec(close, 'db8', level=self.level)
-        coeffs[1:] = [pywt.threshold(i, value=0.05*max(i), mode='soft') for i in coeffs[1:]]
-        self.denoised_close = pywt.waverec(coeffs, 'db8')
-        self.df['denoised_close'] = self.denoised_close
+        self.denoised_close = wavelet_denoise(self.close, self.level)
 
     def find_peaks_valleys(self):
         # Find peaks and valleys
@@ -70,88 +113,85 @@ class Wave_Strat:
 
     def generate_signals(self):
         # Generate buy/sell signals
-        self.signals = pd.Series(index=self.df.index, data=0)
-        self.signals.iloc[self.peaks] = -1  # Sell signal
-        self.signals.iloc[self.valleys] = 1  # Buy signal
+        signals = np.zeros(len(self.close))
+        signals[self.peaks] = -1  # Sell signal
+        signals[self.valleys] = 1  # Buy signal
         
         # Adjust signals for delay
-        self.signals = self.signals.shift(self.signal_delay)
-        self.df['signal'] = self.signals
+        if self.signal_delay:
+            signals[self.signal_delay:] = signals[:-self.signal_delay].copy()
+            signals[:self.signal_delay] = 0
+        self.signals = signals
 
     def calculate_returns(self):
         # Calculate strategy returns
         self.positions = self.signals.cumsum()
-        self.df['position'] = self.positions
-        self.df['returns'] = self.df['close'].pct_change()
-        self.df['strategy_returns'] = self.df['position'].shift(1) * self.df['returns']
-        self.df['cumulative_returns'] = (1 + self.df['strategy_returns']).cumprod()
+        self.returns = np.zeros(len(self.close))
+        self.returns[1:] = self.close[1:] / self.close[:-1] - 1
+        self.strategy_returns = np.zeros(len(self.close))
+        self.strategy_returns[1:] = self.positions[:-1] * self.returns[1:]
+        self.cumulative_returns = (1 + self.strategy_returns).cumprod()
+
+    @property
+    def df(self):
+        # DataFrame of the candles and strategy columns, only built for plotting and research
+        df = self.candles.to_frame()
+        df['denoised_close'] = self.denoised_close
+        df['signal'] = self.signals
+        df['position'] = self.positions
+        df['returns'] = self.returns
+        df['strategy_returns'] = self.strategy_returns
+        df['cumulative_returns'] = self.cumulative_returns
+        return df
 
     def plot_signals(self):
+        df = self.df
         plt.figure(figsize=(12, 6))
-        plt.plot(self.df.index, self.df['close'], label='Close Price')
-        plt.scatter(self.df.index[self.df['signal'] == 1], self.df.loc[self.df['signal'] == 1, 'close'], 
+        plt.plot(df.index, df['close'], label='Close Price')
+        plt.scatter(df.index[df['signal'] == 1], df.loc[df['signal'] == 1, 'close'], 
                     marker='^', color='g', label='Buy Signal', s=100)
-        plt.scatter(self.df.index[self.df['signal'] == -1], self.df.loc[self.df['signal'] == -1, 'close'], 
+        plt.scatter(df.index[df['signal'] == -1], df.loc[df['signal'] == -1, 'close'], 
                     marker='v', color='r', label='Sell Signal', s=100)
-        plt.scatter(self.df.index[self.peaks], self.denoised_close[self.peaks], color='r', label='Peaks')
-        plt.scatter(self.df.index[self.valleys], self.denoised_close[self.valleys], color='g', label='Valleys')
+        plt.scatter(df.index[self.peaks], self.denoised_close[self.peaks], color='r', label='Peaks')
+        plt.scatter(df.index[self.valleys], self.denoised_close[self.valleys], color='g', label='Valleys')
         plt.title('Buy/Sell Signals')
         plt.legend()
         plt.show()
 
     def plot_peaks_valleys(self):
+        df = self.df
         plt.figure(figsize=(12, 6))
-        plt.plot(self.df.index, self.denoised_close, label='Denoised Close')
-        plt.scatter(self.df.index[self.peaks], self.denoised_close[self.peaks], color='r', label='Peaks')
-        plt.scatter(self.df.index[self.valleys], self.denoised_close[self.valleys], color='g', label='Valleys')
+        plt.plot(df.index, self.denoised_close, label='Denoised Close')
+        plt.scatter(df.index[self.peaks], self.denoised_close[self.peaks], color='r', label='Peaks')
+        plt.scatter(df.index[self.valleys], self.denoised_close[self.valleys], color='g', label='Valleys')
         plt.title('Peaks and Valleys')
         plt.legend()
         plt.show()
 
     def plot_denoised_trend(self):
+        df = self.df
         plt.figure(figsize=(12, 6))
-        plt.plot(self.df.index, self.df['close'], label='Original Close')
-        plt.plot(self.df.index, self.denoised_close, label='Denoised Close')
+        plt.plot(df.index, df['close'], label='Original Close')
+        plt.plot(df.index, self.denoised_close, label='Denoised Close')
         plt.title('Original vs Denoised Close Price')
         plt.legend()
         plt.show()
 
     def get_last_signal(self):
-        last_signal = self.df['signal'].iloc[-1]
-        
-        # Find the last non-zero signal
-        non_zero_signals = self.df['signal'][self.df['signal'] != 0]
-        signal_type = None
-        periods_since_last_signal = None
-        if not non_zero_signals.empty:
-            last_non_zero_signal = non_zero_signals.iloc[-1]
-            last_non_zero_index = non_zero_signals.index[-1]
-            periods_since_last_signal = len(self.df) - 1 - self.df.index.get_loc(last_non_zero_index)
-            
-            if last_non_zero_signal == 1:
-                signal_type = 1
-            else:
-                signal_type = -1
-        
-        return {
-            "last_signal": last_signal,
-            "last_non_zero_position": signal_type,
-            "periods_since_last_signal": periods_since_last_signal,
-            "last_non_zero_close_price": self.df['close'].iloc[last_non_zero_index],
-            "current_close_price": self.df['close'].iloc[-1]    
-        }
+        return last_signal(self.peaks, self.valleys, self.close, self.signal_delay)
 
     def plot_backtest_results(self):
+        df = self.df
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
         
         # Plot cumulative returns
-        ax1.plot(self.df.index, self.df['cumulative_returns'], label='Strategy Returns')
+        ax1.plot(df.index, df['cumulative_returns'], label='Strategy Returns')
         ax1.set_title('Cumulative Returns')
         ax1.legend()
         
         # Plot PnL
-        pnl = (self.df['cumulative_returns'] - 1) * 100
-        ax2.plot(self.df.index, pnl, label='PnL (%)')
+        pnl = (df['cumulative_returns'] - 1) * 100
+        ax2.plot(df.index, pnl, label='PnL (%)')
         ax2.set_title('Profit and Loss (%)')
         ax2.legend()
         
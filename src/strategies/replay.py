@@ -0,0 +1,134 @@
+# event driven backtest: archived candles are fed one by one into the same Wave_Strat and StreamingDenoiser
+# run_wave polls live, run_wave's buy/sell rule decides the orders and market orders are filled
+# against an order book (recorded or synthetic) with ProfitLossLogic.calculate_effective_price.
+# Pairs and parameter sets are independent jobs in a process pool
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.data.archive import CandleArchive, ARCHIVE_DIR
+from src.data.candle_buffer import CandleBuffer, TIME, OPEN, CLOSE, VOLUME
+from src.data.candle_store import MAX_CANDLES
+from src.execution.profit_loss_logic import ProfitLossLogic
+from src.strategies.denoise import StreamingDenoiser
+from src.strategies.pv_wave import Wave_Strat, wave_order
+
+# same fee the account summary takes off a sale
+FEE = 0.004
+RESULT_COLUMNS = ['pair', 'interval', 'signal_delay', 'prominence', 'distance', 'level', 'pnl', 'fees', 'trades', 'missed', 'max_drawdown']
+TRADE_COLUMNS = ['time', 'side', 'amount', 'price', 'fee']
+profit_loss_logic = ProfitLossLogic()
+
+
+def synthetic_book(price, volume, spread=0.001, levels=10, step=0.0005, depth=None):
+    """
+    Order book around `price` in OrderBook.orderBookData's format: the best bid/ask are spread / 2 away from it,
+    every further level another `step`. Each level holds `depth` base units, or the candle volume spread over
+    the levels if depth is None
+    """
+    offsets = spread / 2 + step * np.arange(levels)
+    quantity = volume / levels if depth is None else depth
+    return {
+        'bid_prices': (price * (1 - offsets)).tolist(),
+        'bid_quantities': [quantity] * levels,
+        'ask_prices': (price * (1 + offsets)).tolist(),
+        'ask_quantities': [quantity] * levels,
+    }
+
+
+def fill_price(book, side, amount):
+    """
+    Average price of a market order of `amount` walking the book, None if that side of the book is empty.
+    What is left once the book runs out is filled at its last level.
+    """
+    prices, quantities = (book['ask_prices'], book['ask_quantities']) if side == "buy" else (book['bid_prices'], book['bid_quantities'])
+    available = sum(quantities)
+    if not prices or available <= 0:
+        return None
+    price = profit_loss_logic.calculate_effective_price(prices, quantities, amount)
+    if available < amount:
+        price = (price * available + prices[-1] * (amount - available)) / amount
+    return price
+
+
+def replay(candles, size, interval='1', signal_delay=0, prominence=1.1, distance=10, level=1, fee=FEE, books=None, window=MAX_CANDLES):
+    """
+    Run the live wave loop over (n, 8) candle rows oldest first (an archive read, a fetch).
+    After each candle closes the strategy sees the last `window` candles like the candle store keeps them, its
+    order is filled at the open of the next candle against books(row) of that candle, an OrderBook.orderBookData
+    style dict or None for no book, or a synthetic_book around its open by default.
+    Trading starts once the window is full.
+    returns (trades DataFrame [time, side, amount, price, fee], equity Series of the pnl in quote per candle,
+    number of orders that found no book)
+    """
+    candles = np.asarray(candles, dtype=np.float64)
+    pair = "replay"
+    buffer = CandleBuffer(window)
+    # kept between candles like run_wave keeps them between polls
+    denoiser = StreamingDenoiser(level=level)
+    cash = 0.0
+    balance = 0.0
+    missed = 0
+    trades = []
+    equity = np.zeros(len(candles))
+    order = None
+    for t, row in enumerate(candles):
+        if order is not None:
+            book = synthetic_book(row[OPEN], row[VOLUME]) if books is None else books(row)
+            price = None if book is None else fill_price(book, order, size)
+            if price is None:
+                missed += 1
+            else:
+                value = price * size
+                cash += -value if order == "buy" else value
+                cash -= value * fee
+                balance += size if order == "buy" else -size
+                trades.append((row[TIME], order, size, price, value * fee))
+        buffer.append(row)
+        equity[t] = cash + balance * row[CLOSE]
+        order = None
+        if len(buffer) < window:
+            continue
+        strategy = Wave_Strat(pair, interval, signal_delay, prominence, distance, level, candles=buffer, denoiser=denoiser)
+        order = wave_order(strategy.get_last_signal()["last_non_zero_position"], balance > 0)
+
+    trades = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+    trades['time'] = pd.to_datetime(trades['time'], unit='s')
+    equity = pd.Series(equity, index=pd.to_datetime(candles[:, TIME], unit='s'), name='pnl')
+    return trades, equity, missed
+
+
+def replay_job(job):
+    """
+    One replay in a worker: the candles are read from the archive there so only the job dict is pickled.
+    job holds pair, interval, size and optionally start_time, end_time, root, the Wave_Strat parameters,
+    fee, window and books (a picklable callable)
+    """
+    archive = CandleArchive.open(job['pair'], job['interval'], job.get('root', ARCHIVE_DIR))
+    candles = archive.between(job.get('start_time'), job.get('end_time'))
+    params = {key: job[key] for key in ('signal_delay', 'prominence', 'distance', 'level', 'fee', 'books', 'window') if key in job}
+    trades, equity, missed = replay(candles, job['size'], job['interval'], **params)
+    high = np.maximum.accumulate(np.maximum(equity.values, 0))
+    return {
+        'pair': job['pair'],
+        'interval': job['interval'],
+        'signal_delay': job.get('signal_delay', 0),
+        'prominence': job.get('prominence', 1.1),
+        'distance': job.get('distance', 10),
+        'level': job.get('level', 1),
+        'pnl': equity.iloc[-1] if len(equity) else 0.0,
+        'fees': trades['fee'].sum(),
+        'trades': len(trades),
+        'missed': missed,
+        # largest fall of the pnl from its running high, in quote
+        'max_drawdown': (equity.values - high).min(initial=0),
+    }
+
+
+def replay_many(jobs, workers=None):
+    """
+    Replay every job dict (see replay_job) in a process pool, e.g. every pair x parameter set on a year of archive.
+    returns a DataFrame with one row per job in the order given
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(replay_job, jobs))
+    return pd.DataFrame(results, columns=RESULT_COLUMNS)
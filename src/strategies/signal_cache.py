@@ -0,0 +1,86 @@
+# memo of Wave_Strat results per closed candle window, so polls inside a candle that changed nothing are free
+# and polls that only moved the forming candle only redo the wavelet coefficients that candle touches.
+# The peaks/valleys are searched again with find_peaks then
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.strategies.denoise import StreamingDenoiser
+
+# the Wave_Strat attributes computed from the candles
+FIELDS = ['denoised_close', 'peaks', 'valleys', 'signals', 'positions', 'returns', 'strategy_returns', 'cumulative_returns']
+
+
+class SignalCache:
+    """
+    Bounded LRU of Wave_Strat results keyed by the parameters and the closed candles of the window (every candle
+    but the newest, which may still be forming). An entry also remembers the forming candle it was computed with:
+    a poll with the same one gets the stored arrays back, a poll where only it moved is recomputed with a
+    StreamingDenoiser kept per (pair, interval, level), which only redoes the coefficients around the newest candle.
+    Stored arrays are shared between callers so they must not be modified.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        # (parameters, window span) -> {"closed": closes, "forming": (time, close), field: array}
+        self.entries = OrderedDict()
+        # (pair, interval, level) -> {"lock", "denoiser"}
+        self.series = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, strategy):
+        # the span of the window locates the entry, its closes are compared on lookup (a closed candle can still
+        # be revised by the next poll). Comparing is a few us where hashing the window took several times that
+        candles = strategy.candles
+        span = (candles.time[0], candles.time[-1], len(candles)) if len(candles) else None
+        return (strategy.pair, str(strategy.interval), strategy.level, strategy.prominence, strategy.distance, strategy.signal_delay, span)
+
+    def state(self, key):
+        # denoiser of one series, the least recently used series is dropped past maxsize
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = {"lock": threading.Lock(), "denoiser": StreamingDenoiser(level=key[2])}
+                if len(self.series) > self.maxsize:
+                    self.series.popitem(last=False)
+            self.series.move_to_end(key)
+            return self.series[key]
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def apply(self, strategy):
+        """
+        Fill a loaded Wave_Strat's computed attributes from the cache, computing them on a miss
+        """
+        key = self.key(strategy)
+        state = self.state(key[:3])
+        # one computation per series at a time, the denoiser keeps the previous window
+        with state["lock"]:
+            close = strategy.close
+            forming = (strategy.candles.time[-1], close[-1]) if len(close) else None
+            entry = self.get(key)
+            if entry is not None and entry["forming"] == forming and np.array_equal(entry["closed"], close[:-1]):
+                for field in FIELDS:
+                    setattr(strategy, field, entry[field])
+                return strategy
+            if strategy.denoiser is None:
+                strategy.denoiser = state["denoiser"]
+            strategy.compute()
+            entry = {field: getattr(strategy, field) for field in FIELDS}
+            entry["closed"] = close[:-1].copy()
+            entry["forming"] = forming
+            self.put(key, entry)
+            return strategy
+
+
+# shared by every strategy in the process, like the candle store
+signal_cache = SignalCache()
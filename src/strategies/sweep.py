@@ -0,0 +1,98 @@
+# grid search over Wave_Strat parameters on one preloaded candle array
+# the work is shared per stage: one denoise per level, one extrema pass per denoised series, then positions and
+# returns of every (prominence, distance, signal_delay) as array operations. Levels run in a process pool
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.data.candle_buffer import CandleBuffer, CLOSE
+from src.strategies.denoise import wavelet_denoise
+from src.strategies.extrema import ExtremaTable
+
+RESULT_COLUMNS = ['level', 'prominence', 'distance', 'signal_delay', 'total_return', 'sharpe', 'max_drawdown', 'trades']
+# largest (thresholds x delays x candles) block evaluated at once, bigger grids are done in slices of thresholds
+MAX_BLOCK = 1 << 22
+
+
+def closes(candles):
+    # a CandleBuffer, (n, 8) candle rows (archive, fetch) or a plain close array
+    if isinstance(candles, CandleBuffer):
+        return np.array(candles.close)
+    candles = np.asarray(candles, dtype=np.float64)
+    return candles[:, CLOSE].copy() if candles.ndim == 2 else candles
+
+
+def evaluate(close, signals, delays, periods_per_year):
+    """
+    Wave_Strat.calculate_returns for every signals row and delay at once
+    returns (total return, sharpe, max drawdown, trades), each (rows, delays)
+    """
+    n = len(close)
+    delays = np.asarray(delays, dtype=np.int64)
+    # a delay shifts the signals, and so the positions (their running sum), right with zeros in front
+    positions = np.cumsum(signals, axis=1)
+    shifted = np.arange(n) - delays[:, None]
+    positions = np.where(shifted >= 0, positions[:, np.clip(shifted, 0, None)], 0)
+    returns = close[1:] / close[:-1] - 1
+    strategy_returns = positions[..., :-1] * returns
+    cumulative = np.cumprod(1 + strategy_returns, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_return = cumulative[..., -1] - 1 if n > 1 else np.zeros(positions.shape[:2])
+        sharpe = strategy_returns.mean(axis=-1) / strategy_returns.std(axis=-1) * np.sqrt(periods_per_year)
+    # drawdown from the running high of the equity curve, which starts at 1
+    high = np.maximum(np.maximum.accumulate(cumulative, axis=-1), 1)
+    max_drawdown = (cumulative / high - 1).min(axis=-1, initial=0)
+    # signals that showed up inside the window for each delay
+    counts = np.cumsum(signals != 0, axis=1)
+    last = n - 1 - delays
+    trades = np.where(last >= 0, counts[:, np.clip(last, 0, None)], 0)
+    return total_return, sharpe, max_drawdown, trades
+
+
+def sweep_level(close, level, thresholds, delays, periods_per_year):
+    """
+    Results of every (prominence, distance) x delay for one level as a DataFrame
+    """
+    n = len(close)
+    table = ExtremaTable(wavelet_denoise(close, level))
+    step = max(1, MAX_BLOCK // max(1, len(delays) * n))
+    results = []
+    for first in range(0, len(thresholds), step):
+        chunk = thresholds[first:first + step]
+        # signals of each threshold before the delay, one row each
+        signals = np.zeros((len(chunk), n))
+        for row, (prominence, distance) in enumerate(chunk):
+            peaks, valleys = table.select(prominence, distance)
+            signals[row, peaks] = -1
+            signals[row, valleys] = 1
+        total_return, sharpe, max_drawdown, trades = evaluate(close, signals, delays, periods_per_year)
+        results.append(pd.DataFrame({
+            'level': level,
+            'prominence': np.repeat([prominence for prominence, _ in chunk], len(delays)),
+            'distance': np.repeat([distance for _, distance in chunk], len(delays)),
+            'signal_delay': np.tile(delays, len(chunk)),
+            'total_return': total_return.ravel(),
+            'sharpe': sharpe.ravel(),
+            'max_drawdown': max_drawdown.ravel(),
+            'trades': trades.ravel(),
+        }))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=RESULT_COLUMNS)
+
+
+def sweep(candles, signal_delay=(0,), prominence=(1.1,), distance=(10,), level=(1,), interval='1', workers=None):
+    """
+    Wave_Strat results for every combination of the grid on one candle array, nothing is fetched.
+    Every level is one job in a process pool: the close is denoised once, its extrema found once and all
+    thresholds and delays are evaluated from those. interval (minutes) annualizes the sharpe.
+    returns a DataFrame [level, prominence, distance, signal_delay, total_return, sharpe, max_drawdown, trades]
+    """
+    close = closes(candles)
+    thresholds = list(itertools.product(prominence, distance))
+    delays = list(signal_delay)
+    periods_per_year = 365 * 24 * 60 / int(interval)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(sweep_level, close, one, thresholds, delays, periods_per_year) for one in level]
+        results = [job.result() for job in jobs]
+    if not results:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(results, ignore_index=True)[RESULT_COLUMNS]
@@ -5,5 +5,5 @@ echo "reading requirements"
 sudo pip3 install -r ./reqs.txt
 for file in $(find src -name "*.test.py"); do
     echo "running test $file"
-    python3 $file
+    PYTHONPATH=. python3 $file
 done